@@ -1,20 +1,123 @@
+import click
 from flask import Flask
 from flask_cors import CORS
 from routes.forecastRoutes import forecast_bp
 from routes.userRoutes import user_bp
 from config.db import init_app
+from config.jsonProvider import FastJSONProvider
+from config.compression import init_compression
+from config.warmup import APP_WARMUP, warm_up
 from controllers.userController import init_mail
+from models.forecastRollupModel import rebuild_forecast_rollups
+from models.forecastStorageModel import migrate_forecast_storage
+from models.forecastModel import backtest_saved_model, list_model_versions, rollback_model
+from models.backtest import BACKTEST_FOLDS, BACKTEST_HORIZON
+from models.modelRegistry import DEFAULT_MODEL_KEY, current_version, export_predictor
+from config.queryAudit import audit_queries
+from models.userModel import backfill_user_search_keys
 
-app = Flask(__name__)
-CORS(app)
+def create_app():
+    """Create the Flask app.
 
-# Initialize DB
-init_app(app)
-init_mail(app)
+    pandas, scikit-learn, statsmodels and the PDF libraries are imported on
+    first use, so creating the app stays fast for workers that never forecast.
+    Set APP_WARMUP=True to load them and the default model here instead.
+    """
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    CORS(app)
+    init_compression(app)
 
-app.register_blueprint(forecast_bp)
-# Register routes
-app.register_blueprint(user_bp, url_prefix='/api/users')
+    # Initialize DB
+    init_app(app)
+    init_mail(app)
+
+    app.register_blueprint(forecast_bp)
+    # Register routes
+    app.register_blueprint(user_bp, url_prefix='/api/users')
+    register_commands(app)
+
+    if APP_WARMUP:
+        warm_up(app)
+    return app
+
+def register_commands(app):
+    """Register the maintenance commands run as `flask <command>`."""
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups_command():
+        """Recompute forecast rollups and summaries from all stored forecasts."""
+        users = rebuild_forecast_rollups()
+        print(f"Rebuilt forecast rollups for {users} users.")
+
+    @app.cli.command("migrate-forecasts")
+    def migrate_forecasts_command():
+        """Convert stored forecasts to the compact columnar schema."""
+        migrated = migrate_forecast_storage()
+        print(f"Migrated {migrated} forecasts to the compact schema.")
+
+    @app.cli.command("audit-queries")
+    def audit_queries_command():
+        """Explain every query the controllers issue and flag collection scans."""
+        for name, stages, uses_collscan in audit_queries():
+            flag = "COLLSCAN" if uses_collscan else "ok"
+            print(f"[{flag:>8}] {name}: {' > '.join(stages)}")
+
+    @app.cli.command("backfill-user-search")
+    def backfill_user_search_command():
+        """Add search keys to users created before the admin user search."""
+        updated = backfill_user_search_keys()
+        print(f"Added search keys to {updated} users.")
+
+    @app.cli.command("model-versions")
+    @click.option("--model-key", default=DEFAULT_MODEL_KEY, show_default=True, help="Building or tenant model key.")
+    def model_versions_command(model_key):
+        """List the saved model versions, newest first."""
+        for version in list_model_versions(model_key):
+            marker = "*" if version["current"] else " "
+            print(f"{marker} {version['version']}  {version['mode'] or '-':<7} {tuple(version['order'])}x{tuple(version['seasonal_order'])}  nobs={version['nobs']}")
+
+    @app.cli.command("rollback-model")
+    @click.argument("version", required=False)
+    @click.option("--model-key", default=DEFAULT_MODEL_KEY, show_default=True, help="Building or tenant model key.")
+    def rollback_model_command(version, model_key):
+        """Serve an earlier model version (the previous one by default)."""
+        try:
+            print(f"Now serving model version {rollback_model(version, model_key)}.")
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+    @app.cli.command("export-predictor")
+    @click.argument("version", required=False)
+    @click.option("--model-key", default=DEFAULT_MODEL_KEY, show_default=True, help="Building or tenant model key.")
+    def export_predictor_command(version, model_key):
+        """Export and check the NumPy predictor of a model version (the current one by default)."""
+        version = version or current_version(model_key)
+        if version is None:
+            raise click.ClickException(f"No saved model for key {model_key}.")
+        try:
+            predictor = export_predictor(version, model_key)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        if not predictor["exported"]:
+            raise click.ClickException(predictor["error"])
+        print(f"Exported predictor for {model_key}:{version} ({predictor['nbytes']} bytes, max difference {predictor['max_abs_diff']:.3g}).")
+
+    @app.cli.command("backtest")
+    @click.argument("csv_path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--folds", default=BACKTEST_FOLDS, show_default=True, help="Rolling origins to evaluate.")
+    @click.option("--horizon", default=BACKTEST_HORIZON, show_default=True, help="Hours forecast from each origin.")
+    @click.option("--refit/--no-refit", default=True, show_default=True, help="Re-estimate parameters per fold.")
+    @click.option("--model-key", default=DEFAULT_MODEL_KEY, show_default=True, help="Building or tenant model key.")
+    def backtest_command(csv_path, folds, horizon, refit, model_key):
+        """Backtest the saved model on a training CSV and print accuracy and timings."""
+        report = backtest_saved_model(csv_path, folds=folds, horizon=horizon, refit=refit, model_key=model_key)
+        print(f"Model {report['model_version']} {tuple(report['order'])}x{tuple(report['seasonal_order'])}: MAE {report['mae']}, MAPE {report['mape']}%")
+        print("\nstep        MAE     MAPE%")
+        for row in report["per_horizon"]:
+            print(f"{row['step']:>4} {row['mae']!s:>10} {row['mape']!s:>8}")
+        print("\norigin                     MAE     MAPE%   fit s  predict s")
+        for fold in report["per_fold"]:
+            print(f"{fold['origin']:<20} {fold['mae']!s:>10} {fold['mape']!s:>8} {fold['fit_seconds']:>7} {fold['predict_seconds']:>10}")
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,104 @@
+"""Import-time profile of the app module, as a startup regression check.
+
+Runs `python -X importtime -c "import app"` in fresh interpreters, prints
+the slowest imports of the median run, and fails if a library that should
+load on first use (pandas, scikit-learn, statsmodels, matplotlib,
+reportlab, joblib) was imported, or if the median total exceeds the
+committed baseline (importTimeBaseline.json) by more than the tolerance.
+Top-level packages the baseline didn't import are listed as well.
+
+    cd backend && python -m benchmarks.importTime [--top 25] [--runs 5]
+
+The baseline is machine dependent. After an intended startup change, or
+to check on other hardware, refresh it on the reference machine with
+`--save benchmarks/importTimeBaseline.json` and commit the file.
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+
+# Top-level packages the app must not import at startup
+LAZY_PACKAGES = ("pandas", "sklearn", "statsmodels", "matplotlib", "reportlab", "joblib")
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "importTimeBaseline.json")
+
+def profile_imports(statement="import app"):
+    """Return [(module, self_us, cumulative_us)] from -X importtime, in import order."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=backend_dir, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the app failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def _total_ms(rows):
+    # Interpreter startup imports come first; the app module's own line closes the profile
+    return next(cumulative for module, _, cumulative in reversed(rows) if module.strip() == "app") / 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=25, help="Slowest imports to list.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to profile; the median total is compared.")
+    parser.add_argument("--save", help="Write the profile to this JSON file (e.g. to refresh the baseline).")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Fail if the total is above this saved profile's total by more than --tolerance.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown against the baseline.")
+    args = parser.parse_args()
+
+    profiles = sorted((profile_imports() for _ in range(max(args.runs, 1))), key=_total_ms)
+    rows = profiles[len(profiles) // 2]
+    total_ms = _total_ms(rows)
+    loaded = {module.strip().split(".")[0] for module, _, _ in rows}
+    eager = sorted(package for package in LAZY_PACKAGES if package in loaded)
+
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for module, self_us, cumulative_us in sorted(rows, key=lambda row: -row[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f}  {module}")
+    spread = ", ".join(f"{_total_ms(profile):.1f}" for profile in profiles)
+    print(f"\nTotal import time: {total_ms:.1f} ms (median of {spread}) across {len(rows)} modules")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "total_ms": round(total_ms, 1),
+                "runs": len(profiles),
+                "module_count": len(rows),
+                "python": platform.python_version(),
+                "packages": sorted(loaded),
+            }, f, indent=1)
+            f.write("\n")
+        print(f"Saved {args.save}")
+        return
+
+    failures = []
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Baseline: {baseline['total_ms']:.1f} ms across {baseline['module_count']} modules (Python {baseline['python']})")
+        added = sorted(loaded - set(baseline["packages"]))
+        if added:
+            print(f"Packages not imported in the baseline: {', '.join(added)}")
+        if total_ms > baseline["total_ms"] * (1 + args.tolerance):
+            failures.append(f"{total_ms:.1f} ms is more than {args.tolerance:.0%} above the baseline's {baseline['total_ms']:.1f} ms")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Serialization and compression cost of the large analytics responses.
+
+Builds payloads shaped like /trends (a full page of forecast summaries),
+/userforecast (scatter data of every feature) and a year-long
+/predict_forecast response, then times Flask's default provider on the
+payloads converted by hand (ObjectIds and datetimes to strings, as the
+controllers did) against FastJSONProvider on the raw payloads, and reports
+gzip/brotli sizes and times.
+
+    cd backend && python -m benchmarks.jsonResponses [--repeat 20]
+"""
+import argparse
+import datetime
+import json
+import time
+import numpy as np
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from config import compression
+from config.jsonProvider import FastJSONProvider, orjson
+from models.featureEncoder import FEATURE_COLUMNS
+from models.forecastAnalyticsModel import ANALYTICS_FEATURES
+
+def _trends_page(rng, size=500):
+    now = datetime.datetime(2025, 6, 1)
+    return {
+        "forecasts": [
+            {
+                "_id": ObjectId(), "user_id": ObjectId(), "timestamp": now - datetime.timedelta(minutes=i),
+                "first_name": "Ada", "last_name": "Lovelace",
+                "total_forecast_energy": round(float(rng.uniform(1e3, 1e5)), 2),
+                "total_energy_savings": round(float(rng.uniform(10, 1e3)), 2),
+                "peak_load": round(float(rng.uniform(50, 500)), 2),
+            }
+            for i in range(size)
+        ],
+        "total_forecasts": 120000,
+        "average_features": {key: round(float(rng.uniform(0, 50)), 2) for key in FEATURE_COLUMNS},
+    }
+
+def _user_forecast(rng, points=2000):
+    now = datetime.datetime(2025, 6, 1)
+    return {
+        "energy_by_weekday": {w: round(float(rng.uniform(50, 500)), 2) for w in range(7)},
+        "forecasts": [
+            {"timestamp": now - datetime.timedelta(hours=i), "total_forecast_energy": 1234.56, "total_energy_savings": 12.3, "peak_load": 99.1}
+            for i in range(20)
+        ],
+        "scatter_data": {
+            key: [(round(float(c), 2), round(float(e), 2)) for c, e in rng.uniform(0, 500, size=(points, 2))]
+            for key in ANALYTICS_FEATURES
+        },
+    }
+
+def _predict_response(rng, steps=8760):
+    start = datetime.datetime(2025, 1, 1)
+    return {
+        "forecast_data": [
+            {
+                "timestamp": (start + datetime.timedelta(hours=i)).isoformat(),
+                "forecast_energy": round(float(e), 2), "energy_savings": round(float(e) / 10, 2), "peak_load": 499.9,
+                "feature_contributions": {key: round(float(c), 2) for key, c in zip(FEATURE_COLUMNS, rng.uniform(0, 60, len(FEATURE_COLUMNS)))},
+            }
+            for i, e in enumerate(rng.uniform(50, 500, steps))
+        ],
+    }
+
+def _manual_conversion(payload):
+    """The per-document conversion controllers did before FastJSONProvider."""
+    payload = json.loads(json.dumps(payload, default=str))  # deep copy
+    for forecast in payload.get("forecasts", []):
+        for key in ("_id", "user_id", "timestamp"):
+            if key in forecast:
+                forecast[key] = str(forecast[key])
+    return payload
+
+def _best_of(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement; the best time is reported.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    app = Flask(__name__)
+    default_provider, fast_provider = DefaultJSONProvider(app), FastJSONProvider(app)
+    payloads = {"trends": _trends_page(rng), "userforecast": _user_forecast(rng), "predict 8760h": _predict_response(rng)}
+
+    print(f"serializer: {'orjson' if orjson is not None else 'json (orjson not installed)'}; brotli: {'yes' if compression.brotli is not None else 'no'}")
+    print(f"{'payload':<14} {'bytes':>9} {'default ms':>11} {'fast ms':>8} {'gzip bytes':>11} {'gzip ms':>8} {'br bytes':>9} {'br ms':>6}")
+    with app.app_context():
+        for name, payload in payloads.items():
+            converted = _manual_conversion(payload)
+            default_ms, _ = _best_of(lambda: default_provider.dumps(converted).encode(), args.repeat)
+            fast_ms, body = _best_of(lambda: fast_provider.dumps_bytes(payload), args.repeat)
+            gzip_ms, gzipped = _best_of(lambda: compression._compress(body, "gzip"), args.repeat)
+            if compression.brotli is not None:
+                br_ms, brotlied = _best_of(lambda: compression._compress(body, "br"), args.repeat)
+                br = f"{len(brotlied):>9} {br_ms:>6.1f}"
+            else:
+                br = f"{'-':>9} {'-':>6}"
+            print(f"{name:<14} {len(body):>9} {default_ms:>11.1f} {fast_ms:>8.1f} {len(gzipped):>11} {gzip_ms:>8.1f} {br}")
+
+if __name__ == "__main__":
+    main()
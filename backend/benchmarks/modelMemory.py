@@ -0,0 +1,90 @@
+"""Memory of a registry model loaded by two worker processes at once.
+
+Publishes a synthetic SARIMAX version to a temporary registry, then starts
+two fresh processes per load mode that load it and, while both hold it,
+report their RSS, PSS (shared pages split between the processes) and
+private memory from /proc/self/smaps_rollup:
+
+    full filter   SARIMAX results with the filter output of every row
+    low memory    SARIMAX results keeping only the final state (load_version)
+    predictor     the exported StateSpacePredictor (load_predictor)
+
+Linux only.
+
+    cd backend && python -m benchmarks.modelMemory [--rows 2000]
+"""
+import argparse
+import multiprocessing
+import tempfile
+import numpy as np
+from models import modelRegistry
+from models.featureEncoder import FeatureEncoder
+
+MODES = ("full filter", "low memory", "predictor")
+
+def _memory_mb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+def _worker(registry_dir, version, mode, barrier, results):
+    # Libraries are imported before the baseline so only the model itself is measured
+    import statsmodels.tsa.statespace.sarimax  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+    modelRegistry.REGISTRY_DIR = registry_dir
+    before = _memory_mb()
+    if mode == "predictor":
+        models = modelRegistry.load_predictor(version, "bench")
+    else:
+        models = modelRegistry.load_version(version, "bench", low_memory=mode == "low memory")
+    barrier.wait()  # Both processes hold the model
+    after = _memory_mb()
+    results.put({name: after[name] - before[name] for name in after})
+    barrier.wait()
+    del models
+
+def _publish(registry_dir, rows):
+    from sklearn.preprocessing import MinMaxScaler
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    rng = np.random.default_rng(0)
+    encoder = FeatureEncoder()
+    exog = rng.uniform(size=(rows, len(encoder.columns)))
+    energy = np.cumsum(rng.normal(size=rows)) + exog @ rng.uniform(size=len(encoder.columns))
+    energy_scaler = MinMaxScaler().fit(energy.reshape(-1, 1))
+    feature_scaler = MinMaxScaler().fit(exog)
+    model = SARIMAX(energy, exog=exog, order=(5, 1, 0), seasonal_order=(1, 1, 1, 24))
+    fitted = model.filter(model.start_params, low_memory=True)
+    modelRegistry.REGISTRY_DIR = registry_dir
+    return modelRegistry.publish_version(fitted, energy_scaler, feature_scaler, encoder, key="bench")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000, help="Training rows of the synthetic model.")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as registry_dir:
+        version = _publish(registry_dir, args.rows)
+        print(f"rows: {args.rows}; memory added per worker by loading the model, MB")
+        print(f"{'mode':<12} {'worker':>6} {'rss':>8} {'pss':>8} {'private':>8}")
+        for mode in MODES:
+            barrier, results = context.Barrier(2), context.Queue()
+            workers = [context.Process(target=_worker, args=(registry_dir, version, mode, barrier, results)) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            for number in range(2):
+                used = results.get()
+                print(f"{mode:<12} {number:>6} {used['rss']:>8.1f} {used['pss']:>8.1f} {used['private']:>8.1f}")
+            for worker in workers:
+                worker.join()
+
+if __name__ == "__main__":
+    main()
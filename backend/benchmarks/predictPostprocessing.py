@@ -0,0 +1,127 @@
+"""Latency of predict_forecast's post-processing by horizon length.
+
+Runs the forecast, rounding, contributions, response and storage building of
+one scenario with a synthetic exported predictor (no database or trained
+model needed), next to the previous per-row implementation, and checks both
+produce the same response, stored document and summary.
+
+    cd backend && python -m benchmarks.predictPostprocessing [--repeat 5] [--skip-legacy]
+"""
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+from controllers.forecastController import _forecast_scenarios, _forecast_data, _summarize
+from models.featureEncoder import FeatureEncoder
+from models.forecastRollupModel import summarize_forecast
+from models.forecastStorageModel import pack_forecast_columns, pack_forecast_data
+from models.statePredictor import StateSpacePredictor
+
+HORIZONS = (24, 168, 720, 2160, 8760)
+
+def _setup(seed=0):
+    rng = np.random.default_rng(seed)
+    encoder = FeatureEncoder()
+    k_exog, k_states = len(encoder.columns), 26
+    transition = np.diag(np.full(k_states - 1, 1.0), -1)
+    transition[0, :3] = [0.5, 0.2, 0.1]
+    predictor = StateSpacePredictor(
+        design=np.eye(1, k_states).ravel(),
+        transition=transition,
+        state_intercept=np.zeros(k_states),
+        exog_coefficients=rng.normal(size=k_exog),
+        state=rng.normal(size=k_states),
+        # Long enough that every horizon is predicted from training rows, as with real models
+        fitted=rng.uniform(size=2 * max(HORIZONS)),
+    )
+    energy_scaler = MinMaxScaler().fit(rng.uniform(50, 500, size=(100, 1)))
+    feature_scaler = MinMaxScaler().fit(rng.uniform(0, 100, size=(100, k_exog)))
+    return predictor, energy_scaler, feature_scaler, encoder
+
+def _scenario(steps, seed=1):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2025-01-01", periods=steps, freq="h").strftime("%Y-%m-%dT%H:%M:%S").tolist()
+    features = [
+        {
+            "Temperature": float(t), "Humidity": float(h), "SquareFootage": 1500.0, "Occupancy": int(o),
+            "HVACUsage": int(o > 5), "LightingUsage": 1, "RenewableEnergy": float(r),
+            "DayOfWeek": i // 24 % 7, "Holiday": 0,
+        }
+        for i, (t, h, o, r) in enumerate(zip(
+            rng.uniform(15, 35, steps), rng.uniform(20, 80, steps), rng.integers(0, 10, steps), rng.uniform(0, 30, steps)
+        ))
+    ]
+    return timestamps, features
+
+def _new(models, scenario):
+    columns = models[3].columns
+    forecast_columns = _forecast_scenarios(*models, [scenario])[0]
+    response = _forecast_data(forecast_columns, columns)
+    summary = _summarize(forecast_columns, columns)
+    packed = pack_forecast_columns(
+        forecast_columns["timestamps"], forecast_columns["forecast_energy"],
+        forecast_columns["energy_savings"], forecast_columns["feature_contributions"], columns
+    )
+    return response, summary, packed
+
+def _legacy(models, scenario):
+    """The per-row implementation predict_forecast used before."""
+    model, energy_scaler, feature_scaler, encoder = models
+    timestamps, records = scenario
+    features = encoder.encode_records(records)
+    avg_renewable_energy = features[:, encoder.columns.index("RenewableEnergy")].mean()
+    features = feature_scaler.transform(features)
+
+    forecast = energy_scaler.inverse_transform(np.asarray(model.predict(start=len(records), end=2 * len(records) - 1, exog=features)).reshape(-1, 1)).flatten()
+    forecast = np.maximum(forecast, 0)
+    energy_savings = forecast * (avg_renewable_energy / 100)
+    peak_load = np.max(forecast)
+    contributions = pd.DataFrame(
+        np.abs(features) * (forecast[:, None] / np.abs(features).sum(axis=1)[:, None]), columns=encoder.columns
+    )
+
+    response = [
+        {
+            "timestamp": ts.isoformat(),
+            "forecast_energy": round(energy, 2),
+            "energy_savings": round(savings, 2),
+            "peak_load": round(peak_load, 2),
+            "feature_contributions": {feat: round(contributions.iloc[i][feat], 2) for feat in encoder.columns}
+        }
+        for i, (ts, energy, savings) in enumerate(zip(pd.to_datetime(timestamps), forecast, energy_savings))
+    ]
+    return response, summarize_forecast(response), pack_forecast_data(response, encoder.columns)
+
+def _best_of(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def _same(a, b):
+    return json.dumps(a, default=str) == json.dumps(b, default=str)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per horizon; the best time is reported.")
+    parser.add_argument("--skip-legacy", action="store_true", help="Time only the current implementation.")
+    args = parser.parse_args()
+
+    models = _setup()
+    print(f"{'steps':>6} {'current ms':>11} {'legacy ms':>10} {'speedup':>8}  identical")
+    for steps in HORIZONS:
+        scenario = _scenario(steps)
+        new_seconds, new_result = _best_of(lambda: _new(models, scenario), args.repeat)
+        if args.skip_legacy:
+            print(f"{steps:>6} {new_seconds * 1000:>11.2f} {'-':>10} {'-':>8}  -")
+            continue
+        legacy_seconds, legacy_result = _best_of(lambda: _legacy(models, scenario), max(args.repeat // 5, 1))
+        identical = all(_same(new, old) for new, old in zip(new_result, legacy_result))
+        print(f"{steps:>6} {new_seconds * 1000:>11.2f} {legacy_seconds * 1000:>10.2f} {legacy_seconds / new_seconds:>7.1f}x  {identical}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,45 @@
 from flask_pymongo import PyMongo
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
 from dotenv import load_dotenv
 import os
 
 mongo = PyMongo()
 
+# Indexes the controllers rely on: collection -> [(keys, options)]
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+        # Name/email prefix search of the admin user list
+        ([("search_keys", ASCENDING)], {"name": "search_keys"}),
+    ],
+    "forecasts": [
+        # Per-user history, date-range filters and latest-forecast lookups
+        ([("user_id", ASCENDING), ("timestamp", DESCENDING)], {"name": "user_id_timestamp"}),
+        # Daily/date-range rollups across all users
+        ([("timestamp", DESCENDING)], {"name": "timestamp"}),
+    ],
+    "mail_outbox": [
+        # Due messages claimed by the mail dispatchers
+        ([("status", ASCENDING), ("next_attempt_at", ASCENDING)], {"name": "status_next_attempt_at"}),
+        # Sent messages are deleted after MAIL_OUTBOX_RETENTION_DAYS
+        ([("sent_at", ASCENDING)], {"name": "sent_at_ttl", "expireAfterSeconds": int(float(os.getenv("MAIL_OUTBOX_RETENTION_DAYS", 7)) * 86400)}),
+    ],
+    "forecast_rollups": [
+        ([("kind", ASCENDING)], {"name": "kind"}),
+    ],
+}
+
+def ensure_indexes():
+    """Create the required indexes if they don't exist yet (safe to run on every start)."""
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                mongo.db[collection].create_index(keys, **options)
+            except PyMongoError as e:
+                # e.g. duplicate emails blocking the unique index; the app still starts
+                print(f"Could not create index {options['name']} on {collection}: {str(e)}")
+
 def init_app(app):
     load_dotenv()
     app.config["MONGO_URI"] = os.getenv("MONGO_URI")
@@ -12,3 +48,6 @@ def init_app(app):
         raise ValueError("MONGO_URI is not set in the environment variables.")
     
     mongo.init_app(app)
+
+    if os.getenv("MONGO_ENSURE_INDEXES", "True") == "True":
+        ensure_indexes()
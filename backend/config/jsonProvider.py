@@ -0,0 +1,67 @@
+import datetime
+import decimal
+import uuid
+import numpy as np
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional; without it the standard library encoder is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def encode_default(o):
+    """Encode the non-JSON types our responses carry: ObjectIds, dates and NumPy values."""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+        return o.isoformat()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider serializing with orjson when installed, else the standard library.
+
+    ObjectIds become their hex string and dates their ISO string, so
+    controllers can return Mongo documents and NumPy values as they are.
+    Keys are sorted like Flask's default provider.
+    """
+
+    @staticmethod
+    def default(o):
+        return encode_default(o)
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent=False):
+        """Serialize to UTF-8 bytes, the form responses are sent in."""
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=encode_default, option=self._orjson_options(indent))
+            except TypeError:
+                pass  # e.g. integers beyond 64 bits, which the standard library handles
+        return super().dumps(obj, indent=2 if indent else None).encode()
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return self.dumps_bytes(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
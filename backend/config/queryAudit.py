@@ -0,0 +1,56 @@
+import datetime
+from bson import ObjectId
+from config.db import mongo
+from models.forecastAnalyticsModel import user_stats_pipeline
+
+def _sample_ids():
+    """Real ids where available, so the planner sees realistic values."""
+    user = mongo.db.users.find_one({}, {"_id": 1, "email": 1}) or {}
+    return user.get("_id", ObjectId()), user.get("email", "audit@example.com")
+
+def audited_queries():
+    """Every query shape the controllers issue: (name, collection, kind, spec)."""
+    user_id, email = _sample_ids()
+    return [
+        ("register/login: user by email", "users", "find", {"filter": {"email": email}, "limit": 1}),
+        ("profile/get/update/delete: user by id", "users", "find", {"filter": {"_id": user_id}, "limit": 1}),
+        ("userslist: page", "users", "find", {"filter": {"_id": {"$gt": user_id}}, "sort": {"_id": 1}, "limit": 50}),
+        ("userslist: search", "users", "find", {"filter": {"search_keys": {"$regex": "^a"}}, "sort": {"_id": 1}, "limit": 50}),
+        ("trends: page user names", "users", "find", {"filter": {"_id": {"$in": [user_id]}}}),
+        ("trends: global rollup", "forecast_rollups", "find", {"filter": {"_id": "global"}, "limit": 1}),
+        ("trends: forecast page", "forecasts", "find", {"filter": {}, "sort": {"_id": -1}, "limit": 50}),
+        ("userforecast: analytics", "forecasts", "aggregate", {"pipeline": user_stats_pipeline({"user_id": user_id}, 1)}),
+        ("userforecast: recent forecasts", "forecasts", "find", {"filter": {"user_id": user_id}, "sort": {"timestamp": -1}, "limit": 20}),
+        ("download/csv: forecasts in range", "forecasts", "find", {"filter": {"user_id": user_id, "timestamp": {"$gte": datetime.datetime.now() - datetime.timedelta(days=30)}}, "sort": {"timestamp": 1}}),
+        ("download/pdf: latest forecast", "forecasts", "find", {"filter": {"user_id": user_id}, "sort": {"timestamp": -1}, "limit": 1}),
+    ]
+
+def _explain(collection, kind, spec):
+    if kind == "aggregate":
+        return mongo.db.command("explain", {"aggregate": collection, "pipeline": spec["pipeline"], "cursor": {}}, verbosity="queryPlanner")
+    return mongo.db.command("explain", {"find": collection, **spec}, verbosity="queryPlanner")
+
+def _winning_stages(explain):
+    """Collect the stage names of every winning plan in an explain document."""
+    stages = []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            if in_plan and "stage" in node:
+                stages.append(node["stage"])
+            for key, value in node.items():
+                walk(value, in_plan or key == "winningPlan")
+        elif isinstance(node, list):
+            for value in node:
+                walk(value, in_plan)
+
+    walk(explain, False)
+    return stages
+
+def audit_queries():
+    """Explain every controller query and return (name, stages, uses_collscan) rows."""
+    results = []
+    for name, collection, kind, spec in audited_queries():
+        stages = _winning_stages(_explain(collection, kind, spec))
+        results.append((name, stages, "COLLSCAN" in stages))
+    return results
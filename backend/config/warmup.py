@@ -0,0 +1,23 @@
+import os
+import time
+import importlib
+
+# Preload the forecasting libraries and the default model when the app is created
+APP_WARMUP = os.getenv("APP_WARMUP", "False") == "True"
+# Comma-separated modules imported by the warm-up
+APP_WARMUP_MODULES = [name for name in os.getenv("APP_WARMUP_MODULES", "pandas,sklearn.preprocessing").split(",") if name]
+
+def warm_up(app):
+    """Import the libraries forecast requests load on first use and load the default model.
+
+    Run before forking workers (e.g. gunicorn --preload) so they share the
+    loaded pages, or per worker so the first request doesn't pay for them.
+    """
+    from models.forecastModel import get_model
+
+    started = time.monotonic()
+    for name in APP_WARMUP_MODULES:
+        importlib.import_module(name)
+    # Falls back to the statsmodels results, importing statsmodels, when the model has no exported predictor
+    model_loaded = get_model()[0] is not None
+    print(f"Warm-up took {time.monotonic() - started:.2f}s (modules: {', '.join(APP_WARMUP_MODULES)}; default model loaded: {model_loaded})")
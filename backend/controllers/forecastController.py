@@ -1,325 +1,568 @@
-from flask import Blueprint, request, jsonify, g, Response, make_response
-import pandas as pd
+from flask import Blueprint, request, jsonify, g, Response, stream_with_context, send_file
 import numpy as np
-from statsmodels.tsa.statespace.sarimax import SARIMAX
-from sklearn.preprocessing import MinMaxScaler
-from models.forecastModel import save_model, load_model
+from models.forecastModel import get_model, get_model_version, list_model_versions, list_model_keys, rollback_model, get_model_cache_stats
+from models.modelRegistry import DEFAULT_MODEL_KEY, is_valid_key
+from models.statePredictor import StateSpacePredictor
+from models.forecastCache import forecast_cache
+from models.forecastRollupModel import summarize_forecast_columns, update_forecast_rollups, get_forecast_rollup
+from models.featureEncoder import FEATURE_COLUMNS
+from models.forecastStorageModel import pack_forecast_columns, unpack_forecast_data, FORECAST_DATA_PROJECTION
+from models.forecastAnalyticsModel import get_user_forecast_stats, ANALYTICS_FEATURES
+from models.trainingData import REQUIRED_COLUMNS
+from models.backtest import BACKTEST_FOLDS, BACKTEST_HORIZON
+from models.forecastReportModel import get_report, ReportFailed, ReportWorkersUnavailable
+from models.trainingJobModel import save_upload, submit_training_job, get_training_job, list_training_jobs, TrainingQueueFull, TRAINING_MODES
 from config.db import mongo
 from bson import ObjectId
 import datetime
 import io
+import os
 import csv
-from middlewares.authMiddleware import token_required
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-import matplotlib.pyplot as plt
-from reportlab.pdfgen import canvas
-from matplotlib.backends.backend_pdf import FigureCanvasPdf
+import zlib
+from middlewares.authMiddleware import token_required, current_user
 
 forecast_bp = Blueprint('forecast', __name__)
 
-@token_required  
-def train_sarimax():
-    if g.role != "admin":
-        return jsonify({"error": "Unauthorized"}), 403
+def _model_key(value):
+    """Return the building/tenant model key of a request, or raise ValueError."""
+    key = value if value not in (None, "") else DEFAULT_MODEL_KEY
+    if not is_valid_key(key):
+        raise ValueError("model_key may only contain letters, digits, '-' and '_' (up to 64 characters).")
+    return key
 
+def _submit_upload_job(mode, options, message):
+    """Validate the uploaded training CSV and queue a job for it; returns the Flask response."""
     if "file" not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
 
     file = request.files["file"]
     try:
-        df = pd.read_csv(file)
+        import pandas as pd
+        columns = pd.read_csv(file, nrows=0).columns
     except Exception as e:
         return jsonify({"error": f"Error reading file: {str(e)}"}), 400
 
-    required_columns = [
-        "Timestamp", "Temperature", "Humidity", "SquareFootage", "Occupancy",
-        "HVACUsage", "LightingUsage", "RenewableEnergy", "DayOfWeek",
-        "Holiday", "EnergyConsumption"
-    ]
-    
-    if not all(col in df.columns for col in required_columns):
+    if not all(col in columns for col in REQUIRED_COLUMNS):
         return jsonify({"error": "CSV must contain required energy forecasting columns"}), 400
 
-    # Convert timestamp and sort by date
-    df["Timestamp"] = pd.to_datetime(df["Timestamp"])
-    df.set_index("Timestamp", inplace=True)
-    df = df.sort_index()
+    # Hand the upload to a background training process
+    file.stream.seek(0)
+    csv_path = save_upload(file)
+    try:
+        job = submit_training_job(csv_path, submitted_by=g.user_id, mode=mode, options=options)
+    except TrainingQueueFull as e:
+        os.remove(csv_path)
+        return jsonify({"error": str(e)}), 429
 
-    # Convert categorical values to numerical
-    df["HVACUsage"] = df["HVACUsage"].map({"On": 1, "Off": 0})
-    df["LightingUsage"] = df["LightingUsage"].map({"On": 1, "Off": 0})
-    df["Holiday"] = df["Holiday"].map({"Yes": 1, "No": 0})
+    return jsonify({
+        "message": message,
+        "job_id": job["job_id"],
+        "status": job["status"]
+    }), 202
 
-    # Ensure consistent DayOfWeek mapping
-    day_mapping = {
-        "Sunday": 0, "Monday": 1, "Tuesday": 2, "Wednesday": 3,
-        "Thursday": 4, "Friday": 5, "Saturday": 6
-    }
-    df["DayOfWeek"] = df["DayOfWeek"].map(day_mapping).fillna(0).astype(int)
+@token_required  
+def train_sarimax():
+    if g.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
 
-    # Normalize DayOfWeek to 0-1 scale
-    df["DayOfWeek"] = df["DayOfWeek"] / 6.0  
+    # "search" picks the SARIMAX orders within budget_seconds; "append" extends the saved
+    # model with new rows, and refit=true also re-estimates its parameters
+    mode = request.form.get("mode", "full")
+    if mode not in TRAINING_MODES:
+        return jsonify({"error": f"Unknown training mode. Choose from {list(TRAINING_MODES)}"}), 400
+    try:
+        model_key = _model_key(request.form.get("model_key"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if mode == "append" and get_model_version(model_key) is None:
+        return jsonify({"error": "No trained model to append to. Upload the full history first."}), 400
+
+    options = {"model_key": model_key}
+    if mode == "append":
+        options["refit"] = request.form.get("refit", "false").lower() == "true"
+    if mode == "search" and "budget_seconds" in request.form:
+        try:
+            options["budget_seconds"] = float(request.form["budget_seconds"])
+        except ValueError:
+            return jsonify({"error": "budget_seconds must be a number."}), 400
+
+    message = "SARIMAX model update started." if mode == "append" else "SARIMAX model training started."
+    return _submit_upload_job(mode, options, message)
 
-    # Scale features using MinMaxScaler
-    feature_columns = [
-        "Temperature", "Humidity", "SquareFootage", "Occupancy",
-        "HVACUsage", "LightingUsage", "RenewableEnergy", "DayOfWeek", "Holiday"
-    ]
-    scaler = MinMaxScaler()
-    df[feature_columns] = scaler.fit_transform(df[feature_columns])
-
-    # Scale target variable
-    energy_scaler = MinMaxScaler()
-    df["EnergyConsumption"] = energy_scaler.fit_transform(df[["EnergyConsumption"]])
-
-    # Train SARIMAX Model
-    model = SARIMAX(
-        df["EnergyConsumption"], 
-        exog=df[feature_columns],  
-        order=(5,1,0),            
-        seasonal_order=(1,1,1,24) 
-    )
-    
-    fitted_model = model.fit()
+@token_required
+def backtest_sarimax():
+    if g.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        model_key = _model_key(request.form.get("model_key"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if get_model_version(model_key) is None:
+        return jsonify({"error": "No trained model found."}), 400
 
-    # Save the trained model and scalers
-    save_model(fitted_model, energy_scaler, scaler)
+    # Folds refit from the saved parameters unless refit=false, which only reruns the filter
+    try:
+        options = {
+            "model_key": model_key,
+            "folds": int(request.form.get("folds", BACKTEST_FOLDS)),
+            "horizon": int(request.form.get("horizon", BACKTEST_HORIZON)),
+            "refit": request.form.get("refit", "true").lower() == "true",
+        }
+    except ValueError:
+        return jsonify({"error": "folds and horizon must be integers."}), 400
 
-    return jsonify({"message": "SARIMAX model trained successfully."})
+    if options["folds"] < 1 or options["horizon"] < 1:
+        return jsonify({"error": "folds and horizon must be positive."}), 400
 
-@token_required 
-def predict_forecast():
-    model, energy_scaler, feature_scaler = load_model()
-    if model is None:
-        return jsonify({"error": "No trained model found."}), 400
+    return _submit_upload_job("backtest", options, "SARIMAX backtest started.")
+
+@token_required
+def get_training_job_status(job_id):
+    if g.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    job = get_training_job(job_id)
+    if not job:
+        return jsonify({"error": "Training job not found."}), 404
+
+    return jsonify(job)
+
+@token_required
+def get_training_jobs():
+    if g.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify({"jobs": list_training_jobs()})
+
+@token_required
+def get_model_versions():
+    if g.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
 
     try:
-        data = request.get_json()
-        future_timestamps = data.get("timestamps", [])
-        feature_inputs = data.get("features", [])
-    except Exception as e:
-        return jsonify({"error": f"Invalid input: {str(e)}"}), 400
+        model_key = _model_key(request.args.get("model_key"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if not future_timestamps or not feature_inputs or len(future_timestamps) != len(feature_inputs):
-        return jsonify({"error": "Provide matching timestamps and feature values."}), 400
+    return jsonify({"model_key": model_key, "versions": list_model_versions(model_key)})
+
+@token_required
+def get_model_keys():
+    if g.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify({"model_keys": list_model_keys()})
 
-    future_dates = pd.to_datetime(future_timestamps)
-    feature_df = pd.DataFrame(feature_inputs)
+@token_required
+def rollback_model_version():
+    if g.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
 
-    required_features = ["Temperature", "Humidity", "SquareFootage", "Occupancy",
-                         "HVACUsage", "LightingUsage", "RenewableEnergy", "DayOfWeek", "Holiday"]
+    # Without a version, the model saved before the current one is served again
+    data = request.get_json(silent=True) or {}
+    try:
+        model_key = _model_key(data.get("model_key"))
+        version = rollback_model(data.get("version"), model_key)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if not all(col in feature_df.columns for col in required_features):
-        return jsonify({"error": f"Missing required feature columns: {required_features}"}), 400
+    return jsonify({"message": f"Now serving model version {version}.", "model_key": model_key, "version": version})
 
-    # Convert categorical values to numerical
-    feature_df["HVACUsage"] = feature_df["HVACUsage"].astype(int)
-    feature_df["LightingUsage"] = feature_df["LightingUsage"].astype(int)
-    feature_df["Holiday"] = feature_df["Holiday"].map({"Yes": 1, "No": 0}).fillna(0).astype(int)
+# Maximum number of what-if scenarios, and of hourly rows over all of them, accepted by one batch request
+BATCH_MAX_SCENARIOS = int(os.getenv("BATCH_MAX_SCENARIOS", 100))
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", 50000))
 
-    # Normalize DayOfWeek to 0-1 scale
-    feature_df["DayOfWeek"] = feature_df["DayOfWeek"] / 6.0  
+def _validate_scenario(scenario, feature_encoder):
+    """Return (timestamps, features) of a scenario payload or raise ValueError."""
+    if not isinstance(scenario, dict):
+        raise ValueError("Provide matching timestamps and feature values.")
 
-    # Scale the features
-    feature_df_scaled = feature_scaler.transform(feature_df[required_features])
+    future_timestamps = scenario.get("timestamps", [])
+    feature_inputs = scenario.get("features", [])
 
-    # Generate forecast
-    forecast = model.predict(start=len(feature_df), end=len(feature_df) + len(future_dates) - 1, exog=feature_df_scaled)
-    forecast = energy_scaler.inverse_transform(np.array(forecast).reshape(-1, 1)).flatten()
-    forecast = np.maximum(forecast, 0)
+    if not future_timestamps or not feature_inputs or len(future_timestamps) != len(feature_inputs):
+        raise ValueError("Provide matching timestamps and feature values.")
 
-    avg_renewable_energy = np.mean(feature_df["RenewableEnergy"])
-    energy_savings = forecast * (avg_renewable_energy / 100)
-    peak_load = max(forecast)
+    if not all(isinstance(record, dict) for record in feature_inputs) or feature_encoder.missing_columns(feature_inputs):
+        raise ValueError(f"Missing required feature columns: {feature_encoder.columns}")
 
-    # Estimate feature contributions (Fixed Negative Issue)
-    feature_sums = np.abs(feature_df_scaled).sum(axis=1)[:, None]
-    contributions = np.abs(feature_df_scaled) * (forecast[:, None] / feature_sums)
-    contributions = pd.DataFrame(contributions, columns=required_features)
+    return future_timestamps, feature_inputs
 
-    # Fetch user details
-    user = mongo.db.users.find_one({"_id": ObjectId(g.user_id)}, {"first_name": 1, "last_name": 1})
-    first_name = user.get("first_name", "Unknown") if user else "Unknown"
-    last_name = user.get("last_name", "Unknown") if user else "Unknown"
+def _forecast_scenarios(model, energy_scaler, feature_scaler, feature_encoder, scenarios):
+    """Forecast a list of (timestamps, features) scenarios as one stacked matrix.
 
-    # Save forecast details
-    forecast_entry = {
-        "user_id": ObjectId(g.user_id),
+    Returns the rounded per-hour columns of each scenario, in input order.
+    """
+    # Scientific libraries load on first use (see create_app), not when the app starts
+    import pandas as pd
+
+    counts = np.array([len(feature_inputs) for _, feature_inputs in scenarios])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    # Encode with the same lookup tables used in training
+    try:
+        features = feature_encoder.encode_records([record for _, feature_inputs in scenarios for record in feature_inputs])
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid feature values: {str(e)}")
+
+    renewable = features[:, feature_encoder.columns.index("RenewableEnergy")]
+    avg_renewable_energy = np.add.reduceat(renewable, starts) / counts
+
+    # Scale the features in place (same as feature_scaler.transform)
+    features *= feature_scaler.scale_
+    features += feature_scaler.min_
+
+    # Generate forecasts: one call for all scenarios with an exported predictor, else one per scenario
+    if isinstance(model, StateSpacePredictor):
+        forecast = model.predict_scenarios(counts, features)
+    else:
+        forecast = np.concatenate([
+            np.asarray(model.predict(start=count, end=2 * count - 1, exog=features[start:start + count]))
+            for start, count in zip(starts, counts)
+        ])
+    forecast = energy_scaler.inverse_transform(forecast.reshape(-1, 1)).flatten()
+    forecast = np.maximum(forecast, 0)
+
+    energy_savings = forecast * np.repeat(avg_renewable_energy / 100, counts)
+    peak_loads = np.maximum.reduceat(forecast, starts)
+
+    # Estimate feature contributions (Fixed Negative Issue); hours whose scaled features are all zero get none
+    feature_sums = np.abs(features).sum(axis=1)[:, None]
+    shares = np.divide(forecast[:, None], feature_sums, out=np.zeros_like(feature_sums), where=feature_sums != 0)
+    contributions = np.abs(features) * shares
+
+    # Round every column once; cached and returned as plain lists
+    forecast = np.round(forecast, 2).tolist()
+    energy_savings = np.round(energy_savings, 2).tolist()
+    peak_loads = np.round(peak_loads, 2).tolist()
+    contributions = np.round(contributions, 2).tolist()
+
+    results = []
+    for (future_timestamps, _), start, count, peak_load in zip(scenarios, starts, counts, peak_loads):
+        end = start + count
+        results.append({
+            "timestamps": _isoformat(pd.to_datetime(future_timestamps)),
+            "forecast_energy": forecast[start:end],
+            "energy_savings": energy_savings[start:end],
+            "peak_load": peak_load,
+            "feature_contributions": contributions[start:end],
+        })
+    return results
+
+def _isoformat(dates):
+    """ISO strings of a DatetimeIndex, as Timestamp.isoformat() writes them."""
+    import pandas as pd
+    # Naive whole-second timestamps (the usual hourly input) convert in one NumPy call
+    if isinstance(dates, pd.DatetimeIndex) and dates.tz is None and not (dates.asi8 % 1_000_000_000).any():
+        return np.datetime_as_string(dates.values, unit="s").tolist()
+    return [ts.isoformat() for ts in dates]
+
+def _forecast_data(forecast_columns, columns):
+    """Build the per-hour forecast_data list of one scenario from its columns."""
+    peak_load = forecast_columns["peak_load"]
+    return [
+        {
+            "timestamp": ts,
+            "forecast_energy": energy,
+            "energy_savings": savings,
+            "peak_load": peak_load,
+            "feature_contributions": dict(zip(columns, row))
+        }
+        for ts, energy, savings, row in zip(
+            forecast_columns["timestamps"],
+            forecast_columns["forecast_energy"],
+            forecast_columns["energy_savings"],
+            forecast_columns["feature_contributions"]
+        )
+    ]
+
+def _summarize(forecast_columns, columns):
+    return summarize_forecast_columns(
+        forecast_columns["forecast_energy"],
+        forecast_columns["energy_savings"],
+        forecast_columns["feature_contributions"],
+        columns
+    )
+
+def _cached_forecast_scenarios(model_version, model, energy_scaler, feature_scaler, feature_encoder, scenarios):
+    """Return the forecast columns per scenario, computing only the ones not in the forecast cache."""
+    keys = [forecast_cache.make_key(model_version, timestamps, features) for timestamps, features in scenarios]
+    results = [forecast_cache.get(key) for key in keys]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        computed = _forecast_scenarios(model, energy_scaler, feature_scaler, feature_encoder, [scenarios[i] for i in missing])
+        for i, forecast_columns in zip(missing, computed):
+            forecast_cache.set(keys[i], forecast_columns)
+            results[i] = forecast_columns
+    return results
+
+def _forecast_entry(user_id, first_name, last_name, forecast_columns, summary, columns):
+    """Build the stored forecast document for one scenario, in the compact columnar schema."""
+    return {
+        "user_id": ObjectId(user_id),
         "first_name": first_name,
         "last_name": last_name,
         "timestamp": datetime.datetime.now(),
-        "forecast_data": [
-            {
-                "timestamp": ts.isoformat(),
-                "forecast_energy": round(energy, 2),
-                "energy_savings": round(savings, 2),
-                "peak_load": round(peak_load, 2),
-                "feature_contributions": {feat: round(contributions.iloc[i][feat], 2) for feat in required_features}
-            }
-            for i, (ts, energy, savings) in enumerate(zip(future_dates, forecast, energy_savings))
-        ]
+        **pack_forecast_columns(
+            forecast_columns["timestamps"],
+            forecast_columns["forecast_energy"],
+            forecast_columns["energy_savings"],
+            forecast_columns["feature_contributions"],
+            columns
+        ),
+        "total_forecast_energy": summary["total_forecast_energy"],
+        "total_energy_savings": summary["total_energy_savings"],
+        "peak_load": summary["peak_load"]
     }
 
+def _user_names():
+    """Names of the signed-in user, from the request's user context."""
+    user = current_user()
+    first_name = user.get("first_name", "Unknown") if user else "Unknown"
+    last_name = user.get("last_name", "Unknown") if user else "Unknown"
+    return first_name, last_name
+
+@token_required 
+def predict_forecast():
+    try:
+        data = request.get_json()
+        scenario = {"timestamps": data.get("timestamps", []), "features": data.get("features", [])}
+        model_key = _model_key(data.get("model_key"))
+    except Exception as e:
+        return jsonify({"error": f"Invalid input: {str(e)}"}), 400
+
+    # Each building/tenant key has its own model, loaded on first use
+    model, energy_scaler, feature_scaler, feature_encoder, model_version = get_model(model_key)
+    if model is None:
+        return jsonify({"error": f"No trained model found for {model_key}."}), 400
+    model_version = f"{model_key}:{model_version}"
+
+    try:
+        scenario = _validate_scenario(scenario, feature_encoder)
+        forecast_columns = _cached_forecast_scenarios(model_version, model, energy_scaler, feature_scaler, feature_encoder, [scenario])[0]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Fetch user details
+    first_name, last_name = _user_names()
+
+    # Save forecast details
+    summary = _summarize(forecast_columns, feature_encoder.columns)
+    forecast_entry = _forecast_entry(g.user_id, first_name, last_name, forecast_columns, summary, feature_encoder.columns)
+
     mongo.db.forecasts.insert_one(forecast_entry)
+    update_forecast_rollups(ObjectId(g.user_id), [summary])
     return jsonify({
-        "forecast_data": forecast_entry["forecast_data"],
-        "peak_load": forecast_entry["forecast_data"][0]["peak_load"],
+        "forecast_data": _forecast_data(forecast_columns, feature_encoder.columns),
+        "peak_load": forecast_columns["peak_load"],
         "first_name": first_name,
         "last_name": last_name
     })
 
 @token_required
-def get_forecast_trends():
+def predict_forecast_batch():
+    try:
+        data = request.get_json()
+        scenarios = data.get("scenarios", [])
+        model_key = _model_key(data.get("model_key"))
+    except Exception as e:
+        return jsonify({"error": f"Invalid input: {str(e)}"}), 400
+
+    model, energy_scaler, feature_scaler, feature_encoder, model_version = get_model(model_key)
+    if model is None:
+        return jsonify({"error": f"No trained model found for {model_key}."}), 400
+    model_version = f"{model_key}:{model_version}"
+
+    if not isinstance(scenarios, list) or not scenarios:
+        return jsonify({"error": "Provide a list of scenarios."}), 400
+
+    if len(scenarios) > BATCH_MAX_SCENARIOS:
+        return jsonify({"error": f"A batch can contain at most {BATCH_MAX_SCENARIOS} scenarios."}), 400
+
+    try:
+        scenarios = [_validate_scenario(scenario, feature_encoder) for scenario in scenarios]
+        if sum(len(feature_inputs) for _, feature_inputs in scenarios) > BATCH_MAX_ROWS:
+            raise ValueError(f"A batch can contain at most {BATCH_MAX_ROWS} hourly rows over all scenarios.")
+        results = _cached_forecast_scenarios(model_version, model, energy_scaler, feature_scaler, feature_encoder, scenarios)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Fetch user details once for the whole batch
+    first_name, last_name = _user_names()
+
+    summaries = [_summarize(forecast_columns, feature_encoder.columns) for forecast_columns in results]
+    forecast_entries = [
+        _forecast_entry(g.user_id, first_name, last_name, forecast_columns, summary, feature_encoder.columns)
+        for forecast_columns, summary in zip(results, summaries)
+    ]
+    mongo.db.forecasts.insert_many(forecast_entries, ordered=True)
+    update_forecast_rollups(ObjectId(g.user_id), summaries)
+
+    return jsonify({
+        "results": [
+            {
+                "forecast_data": _forecast_data(forecast_columns, feature_encoder.columns),
+                "peak_load": forecast_columns["peak_load"]
+            }
+            for forecast_columns in results
+        ],
+        "first_name": first_name,
+        "last_name": last_name
+    })
+
+@token_required
+def get_forecast_cache_stats():
     if g.role != "admin":
         return jsonify({"error": "Unauthorized"}), 403
 
-    # Fetch all forecast records (including new ones)
-    forecasts = list(mongo.db.forecasts.find({}, {
-        "_id": 1, "user_id": 1, "timestamp": 1, "forecast_data": 1
-    }))
-
-    # Fetch total users count
-    total_users = mongo.db.users.count_documents({})
-    
-    # Get unique users who made forecasts
-    unique_user_ids = set(forecast["user_id"] for forecast in forecasts)
-    total_users_forecasting = len(unique_user_ids)
-
-    # Fetch user details for each unique user_id
-    user_details = {str(user["_id"]): user for user in mongo.db.users.find({}, {"_id": 1, "first_name": 1, "last_name": 1})}
-
-    # Initialize summary metrics
-    total_energy = 0
-    total_energy_savings = 0
-    peak_loads = []
-    all_features = {  
-        "Temperature": 0, "Humidity": 0, "SquareFootage": 0, "Occupancy": 0,
-        "HVACUsage": 0, "LightingUsage": 0, "RenewableEnergy": 0, "DayOfWeek": 0, "Holiday": 0
-    }
-    total_entries = 0
+    return jsonify({**forecast_cache.stats(), "models": get_model_cache_stats()})
+
+# Page size of the forecast list returned by /trends
+TRENDS_PAGE_SIZE = int(os.getenv("TRENDS_PAGE_SIZE", 50))
+TRENDS_MAX_PAGE_SIZE = 500
+
+def _forecast_page(limit, after=None):
+    """Return one page of forecast summaries, newest first, and the cursor for the next page."""
+    match = {"_id": {"$lt": ObjectId(after)}} if after else {}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"_id": -1}},
+        {"$limit": limit},
+        # Forecasts saved before summaries were stored are totalled on the server
+        {"$project": {
+            "_id": 1, "user_id": 1, "timestamp": 1,
+            "total_forecast_energy": {"$ifNull": ["$total_forecast_energy", {"$sum": "$forecast_data.forecast_energy"}]},
+            "total_energy_savings": {"$ifNull": ["$total_energy_savings", {"$sum": "$forecast_data.energy_savings"}]},
+            "peak_load": {"$ifNull": ["$peak_load", {"$ifNull": [{"$max": "$forecast_data.forecast_energy"}, 0]}]}
+        }}
+    ]
+    forecasts = list(mongo.db.forecasts.aggregate(pipeline))
 
-    for forecast in forecasts:
-        forecast["_id"] = str(forecast["_id"])
-        forecast["user_id"] = str(forecast["user_id"])
-        forecast["timestamp"] = forecast.get("timestamp", datetime.datetime.now()).isoformat()
+    # Attach user details for this page only
+    user_ids = list({forecast["user_id"] for forecast in forecasts})
+    user_details = {user["_id"]: user for user in mongo.db.users.find({"_id": {"$in": user_ids}}, {"_id": 1, "first_name": 1, "last_name": 1})}
 
-        # Attach user details if available
+    for forecast in forecasts:
         user_info = user_details.get(forecast["user_id"], {})
+        forecast.setdefault("timestamp", datetime.datetime.now())
         forecast["first_name"] = user_info.get("first_name", "Unknown")
         forecast["last_name"] = user_info.get("last_name", "Unknown")
+        forecast["total_forecast_energy"] = round(forecast["total_forecast_energy"], 2)
+        forecast["total_energy_savings"] = round(forecast["total_energy_savings"], 2)
+        forecast["peak_load"] = round(forecast["peak_load"], 2)
+
+    next_cursor = forecasts[-1]["_id"] if len(forecasts) == limit else None
+    return forecasts, next_cursor
+
+@token_required
+def get_forecast_trends():
+    if g.role != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    try:
+        limit = min(max(int(request.args.get("limit", TRENDS_PAGE_SIZE)), 1), TRENDS_MAX_PAGE_SIZE)
+        after = request.args.get("after")
+        if after and not ObjectId.is_valid(after):
+            raise ValueError("invalid cursor")
+    except ValueError as e:
+        return jsonify({"error": f"Invalid pagination parameters: {str(e)}"}), 400
+
+    # Summary metrics come from the incrementally maintained global rollup
+    rollup = get_forecast_rollup()
+    forecast_count = rollup.get("forecast_count", 0)
+    entry_count = rollup.get("entry_count", 0)
+    feature_sums = rollup.get("feature_sums", {})
 
-        # Compute total forecasted energy and energy savings
-        total_forecast_energy = sum(entry["forecast_energy"] for entry in forecast.get("forecast_data", []))
-        total_energy_savings_entry = sum(entry["energy_savings"] for entry in forecast.get("forecast_data", []))
-        peak_load = max(entry["forecast_energy"] for entry in forecast.get("forecast_data", [])) if forecast.get("forecast_data") else 0
-
-        # Aggregate values
-        total_energy += total_forecast_energy
-        total_energy_savings += total_energy_savings_entry
-        peak_loads.append(peak_load)
-
-        # Summing up feature data for trend analysis
-        for entry in forecast.get("forecast_data", []):
-            features = entry.get("feature_contributions", {})
-            for key in all_features:
-                all_features[key] += features.get(key, 0)
-            total_entries += 1
-
-        # Update forecast object
-        forecast["total_forecast_energy"] = round(total_forecast_energy, 2)
-        forecast["total_energy_savings"] = round(total_energy_savings_entry, 2)
-        forecast["peak_load"] = round(peak_load, 2)
-
-    # Compute averages for features
     avg_features = {
-        key: round(value / total_entries, 2) if total_entries else 0 for key, value in all_features.items()
+        key: round(feature_sums.get(key, 0) / entry_count, 2) if entry_count else 0 for key in FEATURE_COLUMNS
     }
-    average_peak_load = round(np.mean(peak_loads), 2) if peak_loads else 0
+    average_peak_load = round(rollup.get("peak_load_sum", 0) / forecast_count, 2) if forecast_count else 0
+
+    forecasts, next_cursor = _forecast_page(limit, after)
 
     return jsonify({
         "forecasts": forecasts,
-        "total_forecasts": len(forecasts),
-        "total_energy": round(total_energy, 2),
-        "total_energy_savings": round(total_energy_savings, 2),
+        "next_cursor": next_cursor,
+        "total_forecasts": forecast_count,
+        "total_energy": round(rollup.get("total_energy", 0), 2),
+        "total_energy_savings": round(rollup.get("total_energy_savings", 0), 2),
         "average_peak_load": average_peak_load,
         "average_features": avg_features,
-        "total_users": total_users,
-        "total_users_forecasting": total_users_forecasting
+        "total_users": mongo.db.users.estimated_document_count(),
+        "total_users_forecasting": rollup.get("users_forecasting", 0)
     })
 
+# Number of recent forecasts listed in /userforecast
+USER_FORECAST_LIST_SIZE = int(os.getenv("USER_FORECAST_LIST_SIZE", 20))
+
+def _date_range_filter():
+    """Build a forecast `timestamp` filter from the `start`/`end` query parameters (ISO dates)."""
+    date_filter = {}
+    start = request.args.get("start")
+    end = request.args.get("end")
+
+    if start:
+        date_filter["$gte"] = datetime.datetime.fromisoformat(start)
+    if end:
+        # A date without a time includes that whole day
+        end_date = datetime.datetime.fromisoformat(end)
+        if len(end) == 10:
+            date_filter["$lt"] = end_date + datetime.timedelta(days=1)
+        else:
+            date_filter["$lte"] = end_date
+
+    return {"timestamp": date_filter} if date_filter else {}
+
 @token_required
 def get_user_forecast():
     user_id = ObjectId(g.user_id)
 
-    # Fetch all user forecasts
-    forecasts = list(mongo.db.forecasts.find({"user_id": user_id}, {"_id": 0, "timestamp": 1, "forecast_data": 1}))
+    try:
+        match = {"user_id": user_id, **_date_range_filter()}
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {str(e)}"}), 400
 
-    if not forecasts:
-        return jsonify({"message": "No forecasts found for the user."}), 404
+    # Totals, weekday trends and sampled scatter points are computed by MongoDB
+    stats = get_user_forecast_stats(match)
 
-    # Initialize trend analysis
-    total_energy = 0
-    total_savings = 0
-    peak_loads = []
-    forecast_count = len(forecasts)
-    energy_by_weekday = {i: [] for i in range(7)}  # Store values for averaging
+    if not stats["forecast_count"]:
+        return jsonify({"message": "No forecasts found for the user."}), 404
 
-    factor_sums = { 
-        "Temperature": 0, "Humidity": 0, "SquareFootage": 0, "Occupancy": 0,
-        "HVACUsage": 0, "LightingUsage": 0, "RenewableEnergy": 0, "Holiday": 0
+    # Compute averages safely
+    entry_count = stats["entry_count"]
+    avg_peak_load = round(stats["peak_sum"] / entry_count, 2) if entry_count else 0
+    min_peak_load = round(stats["peak_min"], 2) if entry_count else 0
+    max_peak_load = round(stats["peak_max"], 2) if entry_count else 0
+    avg_factors = {
+        key: round(stats["factor_sums"][key] / stats["factor_counts"][key], 2) if stats["factor_counts"][key] > 0 else 0
+        for key in ANALYTICS_FEATURES
+    }
+    avg_energy_by_weekday = {
+        w: round(stats["weekday_sums"][w] / stats["weekday_counts"][w], 2) if stats["weekday_counts"][w] else 0
+        for w in range(7)
     }
-    factor_counts = {key: 0 for key in factor_sums}  # To calculate averages
-
-    # For scatter plot (feature contribution vs. forecasted energy)
-    scatter_data = {key: [] for key in factor_sums}  # Feature -> List of (feature_value, energy)
 
-    for forecast in forecasts:
-        forecast["timestamp"] = forecast["timestamp"].isoformat() if isinstance(forecast["timestamp"], datetime.datetime) else str(forecast["timestamp"])
-
-        for entry in forecast.get("forecast_data", []):
-            forecast_energy = entry.get("forecast_energy", 0)
-            energy_savings = entry.get("energy_savings", 0)
-            peak_load = entry.get("peak_load", 0)
-
-            total_energy += forecast_energy
-            total_savings += energy_savings
-            peak_loads.append(peak_load)
-
-            # Extract weekday trends
-            timestamp = entry.get("timestamp")
-            if timestamp:
-                try:
-                    weekday = datetime.datetime.fromisoformat(timestamp).weekday()
-                    energy_by_weekday[weekday].append(forecast_energy)
-                except ValueError:
-                    pass  # Skip invalid timestamps
-
-            # Aggregate feature contributions for scatter plot
-            for key in factor_sums:
-                if "feature_contributions" in entry and key in entry["feature_contributions"]:
-                    feature_value = entry["feature_contributions"][key]
-                    factor_sums[key] += feature_value
-                    factor_counts[key] += 1
-                    scatter_data[key].append((feature_value, forecast_energy))
+    # Format heatmap data (only weekday-based)
+    formatted_heatmap = [{"weekday": w, "avg_energy": avg} for w, avg in avg_energy_by_weekday.items()]
 
-    # Compute averages safely
-    avg_peak_load = round(np.mean(peak_loads), 2) if peak_loads else 0
-    min_peak_load = round(min(peak_loads), 2) if peak_loads else 0
-    max_peak_load = round(max(peak_loads), 2) if peak_loads else 0
-    avg_factors = {key: round(factor_sums[key] / factor_counts[key], 2) if factor_counts[key] > 0 else 0 for key in factor_sums}
-    avg_energy_by_weekday = {k: round(np.mean(v), 2) if v else 0 for k, v in energy_by_weekday.items()}
+    # For scatter plot (feature contribution vs. forecasted energy), from the sampled entries
+    scatter_data = {key: [] for key in ANALYTICS_FEATURES}
+    for energy, contributions in stats["scatter"]:
+        for key in ANALYTICS_FEATURES:
+            if key in contributions:
+                scatter_data[key].append((contributions[key], energy))
 
-    # Format heatmap data (only weekday-based)
-    formatted_heatmap = [
-        {"weekday": w, "avg_energy": round(np.mean(vals), 2) if vals else 0}
-        for w, vals in energy_by_weekday.items()
-    ]
+    # Only the most recent forecasts are listed, as summaries
+    forecasts = list(mongo.db.forecasts.find(match, {
+        "_id": 0, "timestamp": 1, "total_forecast_energy": 1, "total_energy_savings": 1, "peak_load": 1
+    }).sort("timestamp", -1).limit(USER_FORECAST_LIST_SIZE))
 
     return jsonify({
-        "total_forecasts": forecast_count,
-        "total_energy": round(total_energy, 2),
-        "total_savings": round(total_savings, 2),
+        "total_forecasts": stats["forecast_count"],
+        "total_energy": round(stats["total_energy"], 2),
+        "total_savings": round(stats["total_savings"], 2),
         "avg_peak_load": avg_peak_load,
         "min_peak_load": min_peak_load,
         "max_peak_load": max_peak_load,
@@ -330,86 +573,100 @@ def get_user_forecast():
         "scatter_data": scatter_data  # Scatter plot data
     })
 
+# Forecast documents fetched per cursor batch when exporting
+CSV_EXPORT_BATCH_SIZE = int(os.getenv("CSV_EXPORT_BATCH_SIZE", 200))
+
+# Exportable columns: query name -> (header, value of one forecast_data entry)
+CSV_COLUMNS = {
+    "timestamp": ("Timestamp", lambda entry: entry.get("timestamp")),
+    "forecast_energy": ("Forecast Energy", lambda entry: entry.get("forecast_energy", 0)),
+    "energy_savings": ("Energy Savings", lambda entry: entry.get("energy_savings", 0)),
+    "peak_load": ("Peak Load", lambda entry: entry.get("peak_load", 0)),
+    "feature_contributions": ("Feature Contributions", lambda entry: ", ".join([f"{key}: {value}" for key, value in entry.get("feature_contributions", {}).items()])),
+}
+
+def _csv_rows(cursor, columns, compressor=None):
+    """Yield CSV bytes for each forecast as soon as its rows are written."""
+    csv_output = io.StringIO()
+    csv_writer = csv.writer(csv_output)
+    getters = [CSV_COLUMNS[column][1] for column in columns]
+
+    def flush():
+        data = csv_output.getvalue().encode()
+        csv_output.seek(0)
+        csv_output.truncate(0)
+        return compressor.compress(data) if compressor else data
+
+    # Add header
+    csv_writer.writerow([CSV_COLUMNS[column][0] for column in columns])
+    yield flush()
+
+    for forecast in cursor:
+        for entry in unpack_forecast_data(forecast):
+            csv_writer.writerow([getter(entry) for getter in getters])
+
+        chunk = flush()
+        if chunk:
+            yield chunk
+
+    if compressor:
+        yield compressor.flush()
+
 @token_required
 def download_forecast_csv():
     try:
         user_id = ObjectId(g.user_id)
 
-        # Fetch all user forecasts
-        forecasts = list(mongo.db.forecasts.find({"user_id": user_id}, {"_id": 0, "timestamp": 1, "forecast_data": 1}))
-
-        if not forecasts:
-            return jsonify({"message": "No forecasts found for the user."}), 404
+        try:
+            match = {"user_id": user_id, **_date_range_filter()}
+        except ValueError as e:
+            return jsonify({"message": f"Invalid date range: {str(e)}"}), 400
 
-        # Prepare CSV data
-        csv_output = io.StringIO()
-        csv_writer = csv.writer(csv_output)
+        columns = [column.strip() for column in request.args.get("columns", ",".join(CSV_COLUMNS)).split(",") if column.strip()]
+        unknown = [column for column in columns if column not in CSV_COLUMNS]
+        if not columns or unknown:
+            return jsonify({"message": f"Unknown columns: {unknown}. Choose from {list(CSV_COLUMNS)}"}), 400
 
-        # Add header
-        csv_writer.writerow(["Timestamp", "Forecast Energy", "Energy Savings", "Peak Load", "Feature Contributions"])
-
-        for forecast in forecasts:
-            for entry in forecast.get("forecast_data", []):
-                timestamp = entry.get("timestamp")
-                forecast_energy = entry.get("forecast_energy", 0)
-                energy_savings = entry.get("energy_savings", 0)
-                peak_load = entry.get("peak_load", 0)
-                feature_contributions = ", ".join([f"{key}: {value}" for key, value in entry.get("feature_contributions", {}).items()])
+        if not mongo.db.forecasts.find_one(match, {"_id": 1}):
+            return jsonify({"message": "No forecasts found for the user."}), 404
 
-                csv_writer.writerow([timestamp, forecast_energy, energy_savings, peak_load, feature_contributions])
+        # Stream the forecasts through the cursor instead of loading them all
+        cursor = mongo.db.forecasts.find(match, {"_id": 0, **FORECAST_DATA_PROJECTION}).sort("timestamp", 1).batch_size(CSV_EXPORT_BATCH_SIZE)
 
-        # Make the StringIO object seekable
-        csv_output.seek(0)
+        headers = {"Content-Disposition": "attachment;filename=forecast_data.csv"}
+        compressor = None
+        if request.args.get("gzip") != "0" and "gzip" in request.accept_encodings:
+            compressor = zlib.compressobj(wbits=31)  # gzip container
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
 
         # Send the file as response
-        return Response(csv_output.getvalue(), mimetype="text/csv", headers={"Content-Disposition": "attachment;filename=forecast_data.csv"})
+        return Response(stream_with_context(_csv_rows(cursor, columns, compressor)), mimetype="text/csv", headers=headers)
     except Exception as e:
         print(f"Error in download_forecast_csv: {str(e)}")  # Log the error
         return jsonify({"message": f"An error occurred: {str(e)}"}), 500
 
+# Seconds a download waits for a report being built before answering 202
+REPORT_WAIT_SECONDS = float(os.getenv("REPORT_WAIT_SECONDS", 20))
+
 @token_required
 def download_forecast_pdf():
     user_id = ObjectId(g.user_id)
 
-    # Fetch all user forecasts
-    forecasts = list(mongo.db.forecasts.find({"user_id": user_id}, {"_id": 0, "timestamp": 1, "forecast_data": 1}))
+    # The latest forecast identifies the cached report
+    latest = mongo.db.forecasts.find_one({"user_id": user_id}, {"_id": 0, "timestamp": 1}, sort=[("timestamp", -1)])
 
-    if not forecasts:
+    if not latest:
         return jsonify({"message": "No forecasts found for the user."}), 404
 
-    # Create PDF document
-    pdf_output = io.BytesIO()
-    c = canvas.Canvas(pdf_output, pagesize=letter)
-
-    # Set font and styles
-    c.setFont("Helvetica", 10)
-
-    # Add some title
-    c.drawString(100, 750, "Forecast Data")
-    c.drawString(100, 730, f"User ID: {str(user_id)}")
-
-    y_position = 710
-    for forecast in forecasts:
-        c.drawString(100, y_position, f"Timestamp: {forecast['timestamp']}")
-        y_position -= 20
-
-        for entry in forecast.get("forecast_data", []):
-            c.drawString(100, y_position, f"Forecast Energy: {entry.get('forecast_energy')}")
-            c.drawString(100, y_position - 15, f"Energy Savings: {entry.get('energy_savings')}")
-            c.drawString(100, y_position - 30, f"Peak Load: {entry.get('peak_load')}")
-            c.drawString(100, y_position - 45, f"Feature Contributions: {entry.get('feature_contributions')}")
-            y_position -= 60
-
-            if y_position < 100:  # Handle page overflow
-                c.showPage()
-                y_position = 750
-
-    # Save the PDF
-    c.save()
+    try:
+        path = get_report(user_id, latest.get("timestamp"), REPORT_WAIT_SECONDS)
+    except ReportWorkersUnavailable:
+        return jsonify({"message": "Report generation is temporarily unavailable. Please try again shortly."}), 503
+    except ReportFailed as e:
+        return jsonify({"message": f"Failed to generate the report: {str(e)}"}), 500
+    if path is None:
+        return jsonify({"message": "Your report is being generated. Please try again shortly.", "status": "pending"}), 202
 
     # Send the PDF file as response
-    pdf_output.seek(0)
-    response = make_response(pdf_output.read())
-    response.headers["Content-Type"] = "application/pdf"
-    response.headers["Content-Disposition"] = "attachment;filename=forecast_data.pdf"
-    return response
+    return send_file(os.path.abspath(path), mimetype="application/pdf", as_attachment=True, download_name="forecast_data.pdf")
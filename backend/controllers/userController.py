@@ -1,19 +1,25 @@
 import os
+import re
 import jwt
+import time
 import datetime
 from flask import jsonify, request, g, url_for
-from werkzeug.security import check_password_hash
 from config.db import mongo
-from models.userModel import get_user_schema
+from models.userModel import get_user_schema, HIDDEN_FIELDS_PROJECTION, SEARCH_KEYS_EXPRESSION
+from models.passwordHasher import verify_password, rehash_if_needed, get_hasher_stats, HashQueueFull
 from dotenv import load_dotenv
-from middlewares.authMiddleware import token_required
+from middlewares.authMiddleware import token_required, current_user, forget_user
 from bson import ObjectId
-from flask_mail import Mail, Message
+from flask_mail import Mail
+from pymongo.errors import PyMongoError, DuplicateKeyError
+from models.mailQueueModel import enqueue_mail, init_mail_queue
 
 # Load environment variables
 load_dotenv("./config/.env")
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_EXPIRATION_MINUTES = int(os.getenv("JWT_EXPIRATION_MINUTES", 60))
+# Seconds clients are asked to wait when password hashing is overloaded
+PASSWORD_HASH_RETRY_AFTER = os.getenv("PASSWORD_HASH_RETRY_AFTER", "1")
 # Flask-Mail configuration
 MAIL_SERVER = os.getenv("MAIL_SERVER")
 MAIL_PORT = int(os.getenv("MAIL_PORT", 2525))
@@ -36,6 +42,7 @@ def init_mail(app):
         MAIL_USE_SSL=MAIL_USE_SSL,
     )
     mail.init_app(app)
+    init_mail_queue(app, mail)
 
 def generate_jwt(user_id,role,expires_in=JWT_EXPIRATION_MINUTES):
     """Generate JWT token"""
@@ -51,12 +58,7 @@ def send_verification_email(email, user_id):
     verification_url = url_for("user_bp.verify_email", token=token, _external=True)
 
     # Email content with HTML formatting
-    msg = Message(
-        "Verify Your Email",
-        sender=MAIL_FROM,
-        recipients=[email]
-    )
-    msg.html = f"""
+    html = f"""
     <html>
     <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
         <h2 style="color: #2c3e50;">Welcome to EnerGauge!</h2>
@@ -75,11 +77,12 @@ def send_verification_email(email, user_id):
     </html>
     """
     
+    # Queued for the background sender, so registration doesn't wait for the mail server
     try:
-        mail.send(msg)
+        enqueue_mail([email], "Verify Your Email", html, sender=MAIL_FROM)
         return True
-    except Exception as e:
-        print("Error sending email:", e)
+    except PyMongoError as e:
+        print("Error queueing email:", e)
         return False
 
 def verify_email():
@@ -106,6 +109,9 @@ def verify_email():
     except jwt.InvalidTokenError:
         return jsonify({"message": "Invalid token"}), 400
 
+def _hashing_busy():
+    return jsonify({"message": "Too many requests right now. Please try again shortly."}), 429, {"Retry-After": PASSWORD_HASH_RETRY_AFTER}
+
 #Authentication
 def register_user():
     """User Registration with Email Verification"""
@@ -122,20 +128,26 @@ def register_user():
         return jsonify({"message": "User already exists"}), 400
 
     # Create user schema with default is_verified=False
-    user_data = get_user_schema(
-        first_name=data["first_name"],
-        last_name=data["last_name"],
-        email=data["email"],
-        password=data["password"],
-        address=data.get("address", ""),
-        city=data.get("city", ""),
-        country=data.get("country", ""),
-        phone=data.get("phone", ""),  # Handle phone input
-        is_verified=False
-    )
-
-    # Insert user into database
-    inserted_user = mongo.db.users.insert_one(user_data)
+    try:
+        user_data = get_user_schema(
+            first_name=data["first_name"],
+            last_name=data["last_name"],
+            email=data["email"],
+            password=data["password"],
+            address=data.get("address", ""),
+            city=data.get("city", ""),
+            country=data.get("country", ""),
+            phone=data.get("phone", ""),  # Handle phone input
+            is_verified=False
+        )
+    except HashQueueFull:
+        return _hashing_busy()
+
+    # Insert user into database; the unique email index catches sign-ups racing the check above
+    try:
+        inserted_user = mongo.db.users.insert_one(user_data)
+    except DuplicateKeyError:
+        return jsonify({"message": "User already exists"}), 400
 
     # Send verification email
     email_sent = send_verification_email(data["email"], inserted_user.inserted_id)
@@ -155,8 +167,16 @@ def login_user():
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    if not check_password_hash(user["password"], data["password"]):
-        return jsonify({"message": "Incorrect password"}), 400
+    try:
+        if not verify_password(user["password"], data["password"]):
+            return jsonify({"message": "Incorrect password"}), 400
+    except HashQueueFull:
+        return _hashing_busy()
+
+    # Hashes made with an older work factor are upgraded transparently
+    new_hash = rehash_if_needed(user["password"], data["password"])
+    if new_hash:
+        mongo.db.users.update_one({"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}})
 
     if not user.get("is_verified"):
         return jsonify({"message": "Please verify your email before logging in"}), 403
@@ -164,17 +184,22 @@ def login_user():
     token = generate_jwt(user["_id"], user["role"])
     return jsonify({"message": "Login successful", "token": token}), 200
 
+@token_required
+def get_password_hash_stats():
+    """Hashing queue depth, rejections and latency (admin only)"""
+    if g.role != "admin":
+        return jsonify({"message": "Unauthorized"}), 403
+    return jsonify(get_hasher_stats()), 200
+
 #Users profile
 @token_required
 def get_user_profile():
     """Get user profile details"""
-    user_id = g.user_id  # Use `g.user_id` instead of `request.user_id`
-    user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0})  # Exclude password
+    user = current_user()  # Loaded once per request, without the password
 
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    user["_id"] = str(user["_id"])  # Convert ObjectId to string for JSON response
     return jsonify(user), 200
 
 @token_required
@@ -190,36 +215,76 @@ def update_user_profile():
     if not update_data:
         return jsonify({"message": "No valid fields to update"}), 400
 
-    result = mongo.db.users.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+    result = mongo.db.users.update_one({"_id": ObjectId(user_id)}, _user_update(update_data))
+    forget_user(user_id)
 
     if result.modified_count == 0:
         return jsonify({"message": "No changes made"}), 200
 
     return jsonify({"message": "Profile updated successfully"}), 200
 
+# Page size of the admin user list, the fields it may return and how long its total is cached
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", 50))
+USERS_MAX_PAGE_SIZE = 500
+USER_LIST_FIELDS = ("first_name", "last_name", "email", "phone", "address", "city", "country", "role", "is_verified", "created_at")
+USER_COUNT_CACHE_SECONDS = float(os.getenv("USER_COUNT_CACHE_SECONDS", 60))
+
+_user_count = {"value": 0, "expires_at": 0.0}
+
+def _total_users():
+    """Approximate user count from collection metadata, refreshed every USER_COUNT_CACHE_SECONDS."""
+    if _user_count["expires_at"] <= time.monotonic():
+        _user_count["value"] = mongo.db.users.estimated_document_count()
+        _user_count["expires_at"] = time.monotonic() + USER_COUNT_CACHE_SECONDS
+    return _user_count["value"]
+
+def _user_update(update_data):
+    """Update pipeline setting `update_data` and refreshing search_keys from the new values."""
+    # $literal keeps values such as "$password" from being read as field paths
+    return [
+        {"$set": {field: {"$literal": value} for field, value in update_data.items()}},
+        {"$set": {"search_keys": SEARCH_KEYS_EXPRESSION}},
+    ]
+
 # Get all users
 @token_required
 def get_all_users():
-    """Get all users"""
-    users = mongo.db.users.find({}, {"password": 0})  # Exclude password field
-
-    users_list = []
-    for user in users:
-        user["_id"] = str(user["_id"])  # Convert ObjectId to string for JSON response
-        users_list.append(user)
-
-    return jsonify(users_list), 200
+    """Get one page of users, oldest first, optionally searched by name or email prefix"""
+    try:
+        limit = min(max(int(request.args.get("limit", USERS_PAGE_SIZE)), 1), USERS_MAX_PAGE_SIZE)
+        after = request.args.get("after")
+        if after and not ObjectId.is_valid(after):
+            raise ValueError("invalid cursor")
+        fields = [field for field in request.args.get("fields", ",".join(USER_LIST_FIELDS)).split(",") if field]
+        unknown = [field for field in fields if field not in USER_LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown fields {unknown}, choose from {list(USER_LIST_FIELDS)}")
+    except ValueError as e:
+        return jsonify({"message": f"Invalid parameters: {str(e)}"}), 400
+
+    query = {}
+    if after:
+        query["_id"] = {"$gt": ObjectId(after)}
+    search = request.args.get("q", "").strip().lower()
+    if search:
+        # Anchored and case-sensitive on lowercase keys, so MongoDB scans only the matching index range
+        query["search_keys"] = {"$regex": f"^{re.escape(search)}"}
+
+    projection = {field: 1 for field in fields} or {"_id": 1}
+    users = list(mongo.db.users.find(query, projection).sort("_id", 1).limit(limit))
+    next_cursor = users[-1]["_id"] if len(users) == limit else None
+
+    return jsonify({"users": users, "next_cursor": next_cursor, "total_users": _total_users()}), 200
 
 # Get user by ID
 @token_required
 def get_user(user_id):
     """Get user details by ID"""
-    user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0})  # Exclude password field
+    user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, HIDDEN_FIELDS_PROJECTION)  # Exclude password field
 
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    user["_id"] = str(user["_id"])  # Convert ObjectId to string for JSON response
     return jsonify(user), 200
 
 # Update user by ID
@@ -235,7 +300,8 @@ def update_user(user_id):
     if not update_data:
         return jsonify({"message": "No valid fields to update"}), 400
 
-    result = mongo.db.users.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+    result = mongo.db.users.update_one({"_id": ObjectId(user_id)}, _user_update(update_data))
+    forget_user(user_id)
 
     if result.modified_count == 0:
         return jsonify({"message": "No changes made"}), 200
@@ -247,6 +313,7 @@ def update_user(user_id):
 def delete_user(user_id):
     """Delete user by ID"""
     result = mongo.db.users.delete_one({"_id": ObjectId(user_id)})
+    forget_user(user_id)
 
     if result.deleted_count == 0:
         return jsonify({"message": "User not found"}), 404
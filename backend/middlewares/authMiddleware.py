@@ -1,13 +1,98 @@
 from flask import request, jsonify, g
 import os
 import jwt
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from functools import wraps
+from bson import ObjectId
 from dotenv import load_dotenv
+from config.db import mongo
+from models.userModel import HIDDEN_FIELDS_PROJECTION
 
 # Load environment variables
 load_dotenv("./config/.env")
 JWT_SECRET = os.getenv("JWT_SECRET")
 
+# Verified tokens kept per process (by SHA-256 digest), each until its `exp`
+# and at most AUTH_TOKEN_CACHE_MAX_SECONDS
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 4096))
+AUTH_TOKEN_CACHE_MAX_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_MAX_SECONDS", 300))
+# Signed-in users' documents (without password) shared by requests for a few seconds
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 4096))
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", 30))
+
+class TTLCache:
+    """Small thread-safe LRU whose entries expire at a given time."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+_verified_tokens = TTLCache(AUTH_TOKEN_CACHE_SIZE)
+_users = TTLCache(AUTH_USER_CACHE_SIZE)
+
+def _verify_token(token):
+    """Return the token's claims, verifying the signature only the first time a token is seen."""
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = _verified_tokens.get(digest)
+    if claims is not None:
+        if "exp" in claims and claims["exp"] <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return claims
+
+    claims = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    expires_at = time.time() + AUTH_TOKEN_CACHE_MAX_SECONDS
+    if "exp" in claims:
+        expires_at = min(expires_at, claims["exp"])
+    _verified_tokens.set(digest, claims, expires_at)
+    return claims
+
+def current_user():
+    """The signed-in user's document (without password), or None if it no longer exists.
+
+    Loaded at most once per request, and shared between requests for
+    AUTH_USER_CACHE_TTL_SECONDS; treat it as read-only.
+    """
+    if "current_user" not in g:
+        user = _users.get(g.user_id)
+        if user is None:
+            user = mongo.db.users.find_one({"_id": ObjectId(g.user_id)}, HIDDEN_FIELDS_PROJECTION)
+            if user is not None:
+                _users.set(g.user_id, user, time.time() + AUTH_USER_CACHE_TTL_SECONDS)
+        g.current_user = user
+    return g.current_user
+
+def forget_user(user_id):
+    """Drop a user from this process's cache after changing or deleting them."""
+    _users.discard(str(user_id))
+    if g.get("user_id") == str(user_id):
+        g.pop("current_user", None)
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -22,9 +107,9 @@ def token_required(f):
 
         try:
             # Decode token
-            decoded_data = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+            decoded_data = _verify_token(token)
             g.user_id = decoded_data["user_id"]  # Attach user_id to `g` instead of `request`
-            g.role = decoded_data.get("role") 
+            g.role = decoded_data.get("role")
         except jwt.ExpiredSignatureError:
             return jsonify({"message": "Token has expired"}), 401
         except jwt.InvalidTokenError:
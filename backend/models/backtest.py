@@ -0,0 +1,123 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from models.trainingData import load_training_data
+
+BACKTEST_FOLDS = int(os.getenv("BACKTEST_FOLDS", 5))
+BACKTEST_HORIZON = int(os.getenv("BACKTEST_HORIZON", 24))
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", os.cpu_count() or 1))
+BACKTEST_MAXITER = int(os.getenv("BACKTEST_MAXITER", 50))
+
+_fold_data = None  # (energy, exog, order, seasonal_order, params) shipped once to each worker process
+
+def _init_worker(energy, exog, order, seasonal_order, params):
+    global _fold_data
+    _fold_data = (energy, exog, order, seasonal_order, params)
+
+def _run_fold(origin, horizon, refit):
+    """Worker entry point: fit on the rows before `origin` and forecast the next `horizon` rows."""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    energy, exog, order, seasonal_order, params = _fold_data
+    model = SARIMAX(energy[:origin], exog=exog[:origin], order=order, seasonal_order=seasonal_order)
+
+    # Refit folds re-estimate from the saved parameters; otherwise only the filter runs
+    fit_started = time.monotonic()
+    if refit:
+        fitted = model.fit(start_params=params, maxiter=BACKTEST_MAXITER, disp=False)
+    else:
+        fitted = model.filter(params)
+    fit_seconds = time.monotonic() - fit_started
+
+    predict_started = time.monotonic()
+    forecast = fitted.forecast(steps=horizon, exog=exog[origin:origin + horizon])
+    predict_seconds = time.monotonic() - predict_started
+
+    return {
+        "origin": origin,
+        "forecast": np.asarray(forecast, dtype=np.float64).tolist(),
+        "fit_seconds": round(fit_seconds, 3),
+        "predict_seconds": round(predict_seconds, 4),
+    }
+
+def fold_origins(count, folds, horizon):
+    """Start rows of the test windows: `folds` consecutive windows of `horizon` rows ending at the last row."""
+    origins = [count - horizon * (folds - k) for k in range(folds)]
+    if folds < 1 or horizon < 1 or origins[0] < horizon * 2:
+        raise ValueError("Not enough rows for this many folds and this horizon.")
+    return origins
+
+def _errors(actual, predicted):
+    """Absolute errors and absolute percentage errors (NaN where the actual value is 0)."""
+    absolute = np.abs(predicted - actual)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percentage = np.where(actual != 0, absolute / np.abs(actual) * 100, np.nan)
+    return absolute, percentage
+
+def _mean(values):
+    values = values[~np.isnan(values)]
+    return round(float(values.mean()), 4) if values.size else None
+
+def run_backtest(csv_path, model, energy_scaler, feature_scaler, feature_encoder, folds=BACKTEST_FOLDS,
+                 horizon=BACKTEST_HORIZON, refit=True, workers=BACKTEST_WORKERS, progress=None):
+    """Rolling-origin backtest of a model configuration on a training CSV.
+
+    The CSV is scaled with the model's own scalers and encoder, each fold is
+    fitted in a worker process from the model's orders and parameters, and
+    errors are reported in energy units. Returns MAE/MAPE per horizon step
+    and overall, plus fit and predict time per fold.
+    """
+    energy, exog, _, _ = load_training_data(csv_path, feature_encoder, scalers=(energy_scaler, feature_scaler))
+    energy_values, exog_values = energy.to_numpy(), exog.to_numpy()
+    origins = fold_origins(len(energy_values), folds, horizon)
+
+    order, seasonal_order = tuple(model.model.order), tuple(model.model.seasonal_order)
+    params = np.asarray(model.params, dtype=np.float64)
+
+    results = []
+    executor = ProcessPoolExecutor(
+        max_workers=max(min(workers, folds), 1),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(energy_values, exog_values, order, seasonal_order, params)
+    )
+    with executor:
+        futures = [executor.submit(_run_fold, origin, horizon, refit) for origin in origins]
+        for future in futures:
+            results.append(future.result())
+            if progress:
+                progress(int(100 * len(results) / folds))
+
+    def unscale(values):
+        return energy_scaler.inverse_transform(np.asarray(values).reshape(-1, 1)).ravel()
+
+    absolute = np.empty((folds, horizon))
+    percentage = np.empty((folds, horizon))
+    fold_reports = []
+    for i, result in enumerate(results):
+        origin = result["origin"]
+        actual = unscale(energy_values[origin:origin + horizon])
+        absolute[i], percentage[i] = _errors(actual, unscale(result["forecast"]))
+        fold_reports.append({
+            "origin": energy.index[origin].isoformat(),
+            "mae": _mean(absolute[i]),
+            "mape": _mean(percentage[i]),
+            "fit_seconds": result["fit_seconds"],
+            "predict_seconds": result["predict_seconds"],
+        })
+
+    return {
+        "folds": folds,
+        "horizon": horizon,
+        "refit": refit,
+        "order": list(order),
+        "seasonal_order": list(seasonal_order),
+        "mae": _mean(absolute.ravel()),
+        "mape": _mean(percentage.ravel()),
+        "per_horizon": [
+            {"step": step + 1, "mae": _mean(absolute[:, step]), "mape": _mean(percentage[:, step])}
+            for step in range(horizon)
+        ],
+        "per_fold": fold_reports,
+    }
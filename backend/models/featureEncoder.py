@@ -0,0 +1,93 @@
+import numpy as np
+
+FEATURE_COLUMNS = [
+    "Temperature", "Humidity", "SquareFootage", "Occupancy",
+    "HVACUsage", "LightingUsage", "RenewableEnergy", "DayOfWeek", "Holiday"
+]
+
+# Labels listed in code order, so "Off"/"No"/"Sunday" encode as 0
+CATEGORIES = {
+    "HVACUsage": ["Off", "On"],
+    "LightingUsage": ["Off", "On"],
+    "Holiday": ["No", "Yes"],
+    "DayOfWeek": ["Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"],
+}
+
+# DayOfWeek is normalised to a 0-1 scale
+CATEGORY_SCALES = {"DayOfWeek": 1 / 6.0}
+
+class FeatureEncoder:
+    """Encodes raw feature columns into the float matrix the SARIMAX model expects.
+
+    Training (CSV labels such as "On"/"Yes"/"Monday") and prediction (JSON
+    numbers such as 1/0/day index) go through the same lookup tables, so both
+    always produce identical features. Unknown categorical values encode as 0.
+    """
+
+    def __init__(self, columns=FEATURE_COLUMNS, categories=CATEGORIES, scales=CATEGORY_SCALES):
+        self.columns = list(columns)
+        self.categories = {col: list(labels) for col, labels in categories.items()}
+        self.scales = dict(scales)
+        self._build_tables()
+
+    def _build_tables(self):
+        # Token -> value tables for JSON input, code -> value arrays for CSV categoricals
+        self.token_tables = {}
+        self.code_tables = {}
+        for col, labels in self.categories.items():
+            scale = self.scales.get(col, 1.0)
+            table = {}
+            for code, label in enumerate(labels):
+                # Integer keys also match equal floats and booleans (1.0, True)
+                value = code * scale
+                table[label] = value
+                table[code] = value
+                table[str(code)] = value
+            self.token_tables[col] = table
+
+            # The trailing 0 is picked up by the -1 code pandas uses for unknown labels
+            self.code_tables[col] = np.append(np.arange(len(labels), dtype=np.float64) * scale, 0.0)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_tables()
+
+    def __getstate__(self):
+        return {"columns": self.columns, "categories": self.categories, "scales": self.scales}
+
+    def csv_dtypes(self):
+        """Return pandas dtypes for reading the categorical columns of a training CSV."""
+        from pandas.api.types import CategoricalDtype
+        return {col: CategoricalDtype(labels) for col, labels in self.categories.items()}
+
+    def encode_frame(self, frame, dtype=np.float64):
+        """Encode a DataFrame (categorical columns read with `csv_dtypes`) into a feature matrix."""
+        from pandas.api.types import CategoricalDtype
+        features = np.empty((len(frame), len(self.columns)), dtype=dtype)
+        for i, col in enumerate(self.columns):
+            values = frame[col]
+            if col in self.code_tables:
+                if isinstance(values.dtype, CategoricalDtype):
+                    features[:, i] = self.code_tables[col][values.cat.codes.to_numpy()]
+                else:
+                    table = self.token_tables[col]
+                    features[:, i] = np.fromiter((table.get(v, 0.0) for v in values.to_numpy()), np.float64, len(values))
+            else:
+                features[:, i] = values.to_numpy()
+        return features
+
+    def encode_records(self, records):
+        """Encode a list of feature dicts (the predict API payload) into a C-contiguous float64 matrix."""
+        count = len(records)
+        features = np.empty((count, len(self.columns)), dtype=np.float64)
+        for i, col in enumerate(self.columns):
+            table = self.token_tables.get(col)
+            if table is not None:
+                features[:, i] = np.fromiter((table.get(record[col], 0.0) for record in records), np.float64, count)
+            else:
+                features[:, i] = np.fromiter((record[col] for record in records), np.float64, count)
+        return features
+
+    def missing_columns(self, records):
+        """Return the feature columns absent from any record."""
+        return [col for col in self.columns if not all(col in record for record in records)]
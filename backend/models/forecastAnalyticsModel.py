@@ -0,0 +1,236 @@
+import os
+import random
+import datetime
+import numpy as np
+from pymongo.errors import OperationFailure
+from config.db import mongo
+from models.forecastStorageModel import FORECAST_DATA_PROJECTION, decode_contributions, unpack_forecast_data
+
+# Features shown in the user analytics (DayOfWeek is left out)
+ANALYTICS_FEATURES = [
+    "Temperature", "Humidity", "SquareFootage", "Occupancy",
+    "HVACUsage", "LightingUsage", "RenewableEnergy", "Holiday"
+]
+
+# Number of points returned per scatter plot, whatever the history length
+SCATTER_POINTS = int(os.getenv("SCATTER_POINTS", 200))
+# "mongo" runs the aggregation pipeline, "numpy" the in-process fallback
+USER_ANALYTICS_BACKEND = os.getenv("USER_ANALYTICS_BACKEND", "mongo")
+
+def _empty_stats():
+    return {
+        "forecast_count": 0,
+        "entry_count": 0,
+        "total_energy": 0.0,
+        "total_savings": 0.0,
+        "peak_sum": 0.0,
+        "peak_min": None,
+        "peak_max": None,
+        "factor_sums": {key: 0.0 for key in ANALYTICS_FEATURES},
+        "factor_counts": {key: 0 for key in ANALYTICS_FEATURES},
+        "weekday_sums": [0.0] * 7,  # Monday = 0, like datetime.weekday()
+        "weekday_counts": [0] * 7,
+        "scatter": [],  # Sampled (forecast_energy, feature_contributions) pairs
+    }
+
+def _entries_expression():
+    """Per-forecast array of {energy, savings, peak, date} entries, for either storage schema."""
+    compact = {"$map": {
+        "input": {"$range": [0, {"$size": "$energy"}]},
+        "as": "i",
+        "in": {
+            "energy": {"$arrayElemAt": ["$energy", "$$i"]},
+            "savings": {"$arrayElemAt": ["$savings", "$$i"]},
+            "peak": {"$round": [{"$ifNull": ["$peak_load", 0]}, 2]},
+            "date": {"$cond": [
+                {"$isArray": "$timestamps"},
+                {"$dateFromString": {"dateString": {"$arrayElemAt": ["$timestamps", "$$i"]}, "onError": None, "onNull": None}},
+                {"$add": ["$start", {"$multiply": ["$$i", "$step_seconds", 1000]}]}
+            ]},
+            "index": "$$i"
+        }
+    }}
+    legacy = {"$map": {
+        "input": "$forecast_data",
+        "as": "entry",
+        "in": {
+            "energy": {"$ifNull": ["$$entry.forecast_energy", 0]},
+            "savings": {"$ifNull": ["$$entry.energy_savings", 0]},
+            "peak": {"$ifNull": ["$$entry.peak_load", 0]},
+            "date": {"$dateFromString": {"dateString": "$$entry.timestamp", "onError": None, "onNull": None}},
+            "contributions": "$$entry.feature_contributions"
+        }
+    }}
+    return {"$cond": [{"$isArray": "$energy"}, compact, {"$ifNull": [legacy, []]}]}
+
+def user_stats_pipeline(match, scatter_points):
+    # Compact forecasts carry per-feature sums; legacy ones are summed entry by entry
+    normalized = {"entries": _entries_expression()}
+    factors = {"_id": None}
+    for key in ANALYTICS_FEATURES:
+        legacy_values = f"$forecast_data.feature_contributions.{key}"
+        normalized[f"sum_{key}"] = {"$ifNull": [f"$contribution_sums.{key}", {"$sum": legacy_values}]}
+        normalized[f"count_{key}"] = {"$cond": [
+            {"$isArray": "$energy"},
+            {"$size": "$energy"},
+            {"$size": {"$ifNull": [legacy_values, []]}}
+        ]}
+        factors[f"sum_{key}"] = {"$sum": f"$sum_{key}"}
+        factors[f"count_{key}"] = {"$sum": f"$count_{key}"}
+
+    entry = "$entries"
+    totals = {
+        "_id": None,
+        "entry_count": {"$sum": 1},
+        "total_energy": {"$sum": f"{entry}.energy"},
+        "total_savings": {"$sum": f"{entry}.savings"},
+        "peak_sum": {"$sum": f"{entry}.peak"},
+        "peak_min": {"$min": f"{entry}.peak"},
+        "peak_max": {"$max": f"{entry}.peak"},
+    }
+
+    return [
+        {"$match": match},
+        {"$project": normalized},
+        {"$facet": {
+            "forecasts": [{"$count": "count"}],
+            "factors": [{"$group": factors}],
+            "totals": [{"$unwind": entry}, {"$group": totals}],
+            "weekdays": [
+                {"$unwind": entry},
+                {"$group": {
+                    "_id": {"$dayOfWeek": f"{entry}.date"},
+                    "sum": {"$sum": f"{entry}.energy"},
+                    "count": {"$sum": 1}
+                }}
+            ],
+            "scatter": [
+                {"$unwind": entry},
+                {"$sample": {"size": scatter_points}},
+                {"$project": {"energy": f"{entry}.energy", "contributions": f"{entry}.contributions", "index": f"{entry}.index"}}
+            ]
+        }}
+    ]
+
+def _scatter_points(points):
+    """Resolve sampled points, decoding contributions of compact forecasts from their packed matrix."""
+    compact_ids = list({point["_id"] for point in points if point.get("index") is not None})
+    matrices = {}
+    if compact_ids:
+        for forecast in mongo.db.forecasts.find({"_id": {"$in": compact_ids}}, {"features": 1, "contributions": 1}):
+            matrices[forecast["_id"]] = (forecast["features"], decode_contributions(forecast))
+
+    scatter = []
+    for point in points:
+        contributions = point.get("contributions") or {}
+        if point.get("index") is not None and point["_id"] in matrices:
+            features, matrix = matrices[point["_id"]]
+            contributions = dict(zip(features, np.round(matrix[point["index"]], 2).tolist()))
+        scatter.append((point.get("energy", 0), contributions))
+    return scatter
+
+def _aggregate_user_stats(match, scatter_points):
+    """Compute user analytics with a MongoDB aggregation pipeline."""
+    # Heavy users' unwound entries can pass the 100 MB in-memory limit of $group/$sample
+    result = next(mongo.db.forecasts.aggregate(user_stats_pipeline(match, scatter_points), allowDiskUse=True), {})
+    stats = _empty_stats()
+
+    if result.get("forecasts"):
+        stats["forecast_count"] = result["forecasts"][0]["count"]
+
+    if result.get("factors"):
+        factors = result["factors"][0]
+        for key in ANALYTICS_FEATURES:
+            stats["factor_sums"][key] = factors[f"sum_{key}"]
+            stats["factor_counts"][key] = factors[f"count_{key}"]
+
+    if result.get("totals"):
+        totals = result["totals"][0]
+        for key in ("entry_count", "total_energy", "total_savings", "peak_sum", "peak_min", "peak_max"):
+            stats[key] = totals[key]
+
+    for group in result.get("weekdays", []):
+        if group["_id"] is None:
+            continue  # Skip invalid timestamps
+        weekday = (group["_id"] + 5) % 7  # $dayOfWeek counts from Sunday = 1
+        stats["weekday_sums"][weekday] += group["sum"]
+        stats["weekday_counts"][weekday] += group["count"]
+
+    stats["scatter"] = _scatter_points(result.get("scatter", []))
+    return stats
+
+def _weekdays(timestamps):
+    """Return datetime.weekday() of ISO timestamps, -1 where a timestamp is invalid."""
+    days = np.full(len(timestamps), -1, dtype=np.int64)
+    for i, timestamp in enumerate(timestamps):
+        try:
+            days[i] = datetime.datetime.fromisoformat(timestamp).weekday()
+        except (TypeError, ValueError):
+            pass  # Skip invalid timestamps
+    return days
+
+def summarize_user_forecasts(forecasts, scatter_points=SCATTER_POINTS, seed=None):
+    """Compute user analytics from forecast documents with NumPy.
+
+    Fallback for the aggregation pipeline (and for tests without a MongoDB
+    server). Forecasts are processed one at a time and scatter points are
+    reservoir-sampled, so memory stays bounded for any history length.
+    """
+    rng = random.Random(seed)
+    stats = _empty_stats()
+    weekday_sums = np.zeros(7)
+    weekday_counts = np.zeros(7, dtype=np.int64)
+    seen = 0
+
+    for forecast in forecasts:
+        stats["forecast_count"] += 1
+        entries = unpack_forecast_data(forecast)
+        if not entries:
+            continue
+
+        energy = np.array([entry.get("forecast_energy", 0) for entry in entries], dtype=np.float64)
+        savings = np.array([entry.get("energy_savings", 0) for entry in entries], dtype=np.float64)
+        peaks = np.array([entry.get("peak_load", 0) for entry in entries], dtype=np.float64)
+
+        stats["entry_count"] += len(entries)
+        stats["total_energy"] += float(energy.sum())
+        stats["total_savings"] += float(savings.sum())
+        stats["peak_sum"] += float(peaks.sum())
+        stats["peak_min"] = float(peaks.min()) if stats["peak_min"] is None else min(stats["peak_min"], float(peaks.min()))
+        stats["peak_max"] = float(peaks.max()) if stats["peak_max"] is None else max(stats["peak_max"], float(peaks.max()))
+
+        weekdays = _weekdays([entry.get("timestamp") for entry in entries])
+        valid = weekdays >= 0
+        weekday_sums += np.bincount(weekdays[valid], weights=energy[valid], minlength=7)
+        weekday_counts += np.bincount(weekdays[valid], minlength=7)
+
+        for key in ANALYTICS_FEATURES:
+            values = [entry["feature_contributions"][key] for entry in entries if key in entry.get("feature_contributions", {})]
+            stats["factor_sums"][key] += float(np.sum(values)) if values else 0.0
+            stats["factor_counts"][key] += len(values)
+
+        # Reservoir sampling keeps a uniform sample of every entry seen so far
+        for entry, entry_energy in zip(entries, energy):
+            seen += 1
+            point = (float(entry_energy), entry.get("feature_contributions", {}))
+            if len(stats["scatter"]) < scatter_points:
+                stats["scatter"].append(point)
+            else:
+                slot = rng.randrange(seen)
+                if slot < scatter_points:
+                    stats["scatter"][slot] = point
+
+    stats["weekday_sums"] = weekday_sums.tolist()
+    stats["weekday_counts"] = weekday_counts.tolist()
+    return stats
+
+def get_user_forecast_stats(match, scatter_points=SCATTER_POINTS):
+    """Return analytics for the forecasts matching `match`, preferring the aggregation pipeline."""
+    if USER_ANALYTICS_BACKEND == "mongo":
+        try:
+            return _aggregate_user_stats(match, scatter_points)
+        except OperationFailure as e:
+            print(f"User analytics aggregation failed, using NumPy fallback: {str(e)}")
+
+    cursor = mongo.db.forecasts.find(match, {"_id": 0, **FORECAST_DATA_PROJECTION})
+    return summarize_user_forecasts(cursor, scatter_points)
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", 1024))
+FORECAST_CACHE_TTL_SECONDS = float(os.getenv("FORECAST_CACHE_TTL_SECONDS", 600))
+# Optional shared backend: "redis" (needs FORECAST_CACHE_REDIS_URL) or "local"
+FORECAST_CACHE_BACKEND = os.getenv("FORECAST_CACHE_BACKEND", "")
+FORECAST_CACHE_REDIS_URL = os.getenv("FORECAST_CACHE_REDIS_URL")
+# Bumped whenever cached values change shape or meaning, so shared entries of another format are never read
+FORECAST_CACHE_FORMAT = 3
+
+class LocalCacheBackend:
+    """In-memory stand-in for a shared cache backend (same interface as RedisCacheBackend)."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class RedisCacheBackend:
+    """Shared cache backend storing JSON values in Redis under a key prefix."""
+
+    def __init__(self, url, prefix="forecast-cache:"):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self._prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, json.dumps(value), ex=max(int(ttl), 1))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self._prefix + "*"):
+            self._client.delete(key)
+
+class ForecastCache:
+    """Bounded LRU/TTL cache for forecast results, with an optional shared backend behind it."""
+
+    def __init__(self, max_entries=FORECAST_CACHE_SIZE, ttl_seconds=FORECAST_CACHE_TTL_SECONDS, shared_backend=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_backend = shared_backend
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(model_version, timestamps, features):
+        """Hash the cache format, the model version and a canonical JSON form of the inputs."""
+        payload = json.dumps([FORECAST_CACHE_FORMAT, model_version, timestamps, features], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+        if self.shared_backend is not None:
+            try:
+                value = self.shared_backend.get(key)
+            except Exception as e:
+                print(f"Forecast cache backend error: {str(e)}")
+                value = None
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self._stats["shared_hits"] += 1
+                return value
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.shared_backend is not None:
+            try:
+                self.shared_backend.set(key, value, self.ttl_seconds)
+            except Exception as e:
+                print(f"Forecast cache backend error: {str(e)}")
+
+    def clear(self, shared=False):
+        """Drop every cached result, e.g. after a new model was saved.
+
+        Keys already include the model version, so the shared backend only
+        needs clearing once, by the process that saved the model.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+        if shared and self.shared_backend is not None:
+            try:
+                self.shared_backend.clear()
+            except Exception as e:
+                print(f"Forecast cache backend error: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds}
+
+def _shared_backend():
+    if FORECAST_CACHE_BACKEND == "redis" and FORECAST_CACHE_REDIS_URL:
+        return RedisCacheBackend(FORECAST_CACHE_REDIS_URL)
+    if FORECAST_CACHE_BACKEND == "local":
+        return LocalCacheBackend()
+    return None
+
+forecast_cache = ForecastCache(shared_backend=_shared_backend())
@@ -1,29 +1,424 @@
-import joblib
 import os
+import json
+import time
+import numpy as np
 from config.db import mongo
+from models.trainingData import load_training_data
+from models.featureEncoder import FeatureEncoder
+from models.forecastCache import forecast_cache
+from models.orderSearch import search_orders, SEARCH_BUDGET_SECONDS
+from models.backtest import run_backtest, BACKTEST_FOLDS, BACKTEST_HORIZON
+from models.modelRegistry import publish_version, load_version, load_predictor, current_version, list_keys, list_versions, read_manifest, rollback, DEFAULT_MODEL_KEY
+from models.modelCache import ModelCache, model_nbytes
 
+# Models saved before the registry existed; still served when the registry is empty
 MODEL_PATH = "models/trainedDataForecast/sarimax_model.pkl"
 SCALER_PATH = "models/trainedDataForecast/energy_scaler.pkl"
 FEATURE_SCALER_PATH = "models/trainedDataForecast/feature_scaler.pkl"
+ENCODER_PATH = "models/trainedDataForecast/feature_encoder.pkl"
+INFO_PATH = "models/trainedDataForecast/model_info.json"
 
-def save_model(model, energy_scaler, feature_scaler):
-    """Save the SARIMAX model and scalers."""
-    os.makedirs("models/trainedDataForecast", exist_ok=True)
-    
-    joblib.dump(model, MODEL_PATH)
-    joblib.dump(energy_scaler, SCALER_PATH)
-    joblib.dump(feature_scaler, FEATURE_SCALER_PATH)
+SARIMAX_ORDER = (5, 1, 0)
+SARIMAX_SEASONAL_ORDER = (1, 1, 1, 24)
+SARIMAX_MAXITER = 50
 
-def load_model():
-    """Load the SARIMAX model and scalers if available."""
+# Appended models re-estimate their parameters once the last full fit is this old
+MODEL_FULL_REFIT_DAYS = float(os.getenv("MODEL_FULL_REFIT_DAYS", 7))
+
+# How often (seconds) the cached model checks the registry's current version
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", 1))
+
+# Serve forecasts from the NumPy predictor exported with each version instead of the full statsmodels results
+MODEL_SERVE_PREDICTOR = os.getenv("MODEL_SERVE_PREDICTOR", "True") == "True"
+
+# Loaded models by key, loaded lazily and evicted least recently used first
+_model_cache = ModelCache()
+
+def save_model(model, energy_scaler, feature_scaler, feature_encoder, info=None, model_key=DEFAULT_MODEL_KEY):
+    """Save the SARIMAX model, scalers, feature encoder and optional training info as a new version of `model_key`."""
+    version = publish_version(model, energy_scaler, feature_scaler, feature_encoder, info, key=model_key)
+    _model_cache.discard(model_key)
+    forecast_cache.clear(shared=True)
+    return version
+
+def rollback_model(version=None, model_key=DEFAULT_MODEL_KEY):
+    """Serve an earlier version of `model_key` again (the previous one by default). Returns it."""
+    version = rollback(version, key=model_key)
+    _model_cache.discard(model_key)
+    return version
+
+def list_model_versions(model_key=DEFAULT_MODEL_KEY):
+    """Return the versions of `model_key`, newest first, with their training info."""
+    current = current_version(model_key)
+    versions = []
+    for version in reversed(list_versions(model_key)):
+        manifest = read_manifest(version, model_key)
+        versions.append({
+            "version": version,
+            "current": version == current,
+            "created_at": manifest["created_at"],
+            "order": manifest["order"],
+            "seasonal_order": manifest["seasonal_order"],
+            "mode": manifest["info"].get("mode"),
+            "nobs": manifest["info"].get("nobs"),
+        })
+    return versions
+
+def list_model_keys():
+    """Return the building/tenant keys that have a saved model."""
+    keys = list_keys()
+    if DEFAULT_MODEL_KEY not in keys and get_model_version() is not None:
+        keys.insert(0, DEFAULT_MODEL_KEY)  # Served from the legacy pickles
+    return keys
+
+def get_model_cache_stats():
+    return _model_cache.stats()
+
+def _load_legacy_model():
     if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH) or not os.path.exists(FEATURE_SCALER_PATH):
-        return None, None, None
-    
+        return None, None, None, None
+
+    import joblib
+
     model = joblib.load(MODEL_PATH)
     energy_scaler = joblib.load(SCALER_PATH)
     feature_scaler = joblib.load(FEATURE_SCALER_PATH)
 
-    return model, energy_scaler, feature_scaler
+    # Models saved before the encoder existed use the default encoding
+    feature_encoder = joblib.load(ENCODER_PATH) if os.path.exists(ENCODER_PATH) else FeatureEncoder()
+
+    return model, energy_scaler, feature_scaler, feature_encoder
+
+def load_model(version=None, model_key=DEFAULT_MODEL_KEY):
+    """Load the SARIMAX model, scalers and feature encoder of a version of `model_key` (the current one by default)."""
+    version = version or current_version(model_key)
+    if version is None:
+        # Only the default key falls back to the pickles saved before the registry existed
+        return _load_legacy_model() if model_key == DEFAULT_MODEL_KEY else (None, None, None, None)
+    return load_version(version, model_key)
+
+def load_model_info(model_key=DEFAULT_MODEL_KEY):
+    """Return the training info saved with the current model of `model_key`, or {} if there is none."""
+    version = current_version(model_key)
+    if version is not None:
+        return read_manifest(version, model_key)["info"]
+    if model_key != DEFAULT_MODEL_KEY:
+        return {}
+
+    try:
+        with open(INFO_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def get_model_version(model_key=DEFAULT_MODEL_KEY):
+    """Return the version of the model served for `model_key`, or None if it has no model."""
+    version = current_version(model_key)
+    if version is not None or model_key != DEFAULT_MODEL_KEY:
+        return version
+
+    # Pickles saved before the registry existed are identified by their mtimes
+    try:
+        return str(max(os.stat(path).st_mtime_ns for path in (MODEL_PATH, SCALER_PATH, FEATURE_SCALER_PATH)))
+    except FileNotFoundError:
+        return None
+
+def _load_current(model_key):
+    """Load the key's current registry version; returns (version, models), or (None, None) if it has none.
+
+    A version pruned between reading CURRENT and loading its files is
+    retried once with the version CURRENT has moved on to.
+    """
+    for attempt in range(2):
+        version = current_version(model_key)
+        if version is None:
+            return None, None
+        try:
+            # Without a predictor, keep the filter output that in-sample predictions read
+            return version, (MODEL_SERVE_PREDICTOR and load_predictor(version, model_key)) or load_version(version, model_key, low_memory=False)
+        except FileNotFoundError:
+            if attempt or current_version(model_key) == version:
+                raise
+
+def get_model(model_key=DEFAULT_MODEL_KEY):
+    """Return (model, energy_scaler, feature_scaler, feature_encoder, version) for `model_key`.
+
+    Models load on first use and are reloaded only when the key's current
+    version changed; at most MODEL_CACHE_MAX_MODELS / MODEL_CACHE_MAX_MB
+    stay loaded per process. The model is the version's exported
+    StateSpacePredictor when it has one, else the SARIMAX results; both
+    provide predict(start, end, exog) and forecast(steps, exog).
+    """
+    entry = _model_cache.get(model_key)
+    if entry is not None and time.monotonic() - entry["checked_at"] < MODEL_RELOAD_CHECK_SECONDS:
+        return (*entry["models"], entry["version"])
+
+    with _model_cache.key_lock(model_key):
+        entry = _model_cache.get(model_key, record=False)
+        registry_version = current_version(model_key)
+        version = registry_version or get_model_version(model_key)
+        if version is None:
+            return None, None, None, None, None
+
+        if entry is not None and version == entry["version"]:
+            entry["checked_at"] = time.monotonic()
+            return (*entry["models"], entry["version"])
+
+        # Registry versions are immutable, so the files always match `version`
+        if registry_version is not None:
+            version, models = _load_current(model_key)
+        else:
+            models = _load_legacy_model()
+        if models is None or models[0] is None:
+            return None, None, None, None, None
+
+        _model_cache.put(model_key, version, models, model_nbytes(models[0]), time.monotonic())
+        return (*models, version)
+
+def train_sarimax_model(csv_path, progress=None, model_key=DEFAULT_MODEL_KEY):
+    """Train the SARIMAX model of `model_key` from a CSV file, save it and return fit metrics.
+
+    `progress(stage, percent)` is called as training moves along, if given.
+    """
+    def report(stage, percent):
+        if progress:
+            progress(stage, percent)
+
+    report("reading", 5)
+
+    # Stream the CSV into scaled, sorted arrays without holding the raw frame
+    feature_encoder = FeatureEncoder()
+    energy, exog, energy_scaler, scaler = load_training_data(csv_path, feature_encoder)
+
+    report("fitting", 30)
+
+    # Train SARIMAX Model; statsmodels is only imported by processes that train
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    model = SARIMAX(
+        energy,
+        exog=exog,
+        order=SARIMAX_ORDER,
+        seasonal_order=SARIMAX_SEASONAL_ORDER
+    )
+
+    iterations = [0]
+
+    def on_iteration(params):
+        iterations[0] += 1
+        report("fitting", 30 + int(60 * min(iterations[0] / SARIMAX_MAXITER, 1)))
+
+    fit_started = time.monotonic()
+    fitted_model = _without_callback(model.fit(maxiter=SARIMAX_MAXITER, callback=on_iteration, disp=False))
+    fit_seconds = time.monotonic() - fit_started
+
+    report("saving", 95)
+
+    # Save the trained model, scalers and the encoder they were built with
+    save_model(fitted_model, energy_scaler, scaler, feature_encoder, info={
+        "mode": "full",
+        "trained_at": time.time(),
+        "last_full_fit_at": time.time(),
+        "last_timestamp": energy.index[-1].isoformat(),
+        "nobs": int(fitted_model.nobs),
+        "appended_since_full_fit": 0,
+        **_model_spec(fitted_model),
+    }, model_key=model_key)
+
+    return _fit_metrics(fitted_model, iterations[0], fit_seconds, model_key)
+
+def _without_callback(fitted_model):
+    """Drop the progress callback fit() keeps in the results' settings; a local function can't be pickled."""
+    fitted_model.mle_settings["callback"] = None
+    return fitted_model
+
+def _model_spec(fitted_model):
+    """Orders and fitted parameters of a model, kept in the info file to warm-start later searches."""
+    return {
+        "order": list(fitted_model.model.order),
+        "seasonal_order": list(fitted_model.model.seasonal_order),
+        "params": np.asarray(fitted_model.params, dtype=np.float64).tolist(),
+    }
+
+def search_sarimax_model(csv_path, budget_seconds=None, progress=None, model_key=DEFAULT_MODEL_KEY):
+    """Train SARIMAX on a CSV with the order that scores the best AIC in a parallel search, and save it."""
+    def report(stage, percent):
+        if progress:
+            progress(stage, percent)
+
+    report("reading", 5)
+
+    feature_encoder = FeatureEncoder()
+    energy, exog, energy_scaler, scaler = load_training_data(csv_path, feature_encoder)
+
+    # The saved model's parameters warm-start the candidate with the same orders
+    info = load_model_info(model_key)
+    warm_start = {}
+    if info.get("params") and info.get("order") and info.get("seasonal_order"):
+        warm_start[(tuple(info["order"]), tuple(info["seasonal_order"]))] = info["params"]
+
+    report("searching", 10)
+    search_started = time.monotonic()
+    best, leaderboard = search_orders(
+        energy, exog,
+        maxiter=SARIMAX_MAXITER,
+        budget_seconds=budget_seconds or SEARCH_BUDGET_SECONDS,
+        warm_start=warm_start,
+        progress=lambda percent: report("searching", 10 + int(percent * 0.8))
+    )
+    search_seconds = time.monotonic() - search_started
+
+    # Rebuild the winner's results from its parameters instead of shipping them between processes
+    report("saving", 95)
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    model = SARIMAX(energy, exog=exog, order=tuple(best["order"]), seasonal_order=tuple(best["seasonal_order"]))
+    fitted_model = model.filter(best["params"])
+
+    save_model(fitted_model, energy_scaler, scaler, feature_encoder, info={
+        "mode": "search",
+        "trained_at": time.time(),
+        "last_full_fit_at": time.time(),
+        "last_timestamp": energy.index[-1].isoformat(),
+        "nobs": int(fitted_model.nobs),
+        "appended_since_full_fit": 0,
+        "search_seconds": round(search_seconds, 3),
+        "leaderboard": leaderboard,
+        **_model_spec(fitted_model),
+    }, model_key=model_key)
+
+    return {
+        **_fit_metrics(fitted_model, 0, best["fit_seconds"], model_key),
+        "order": best["order"],
+        "seasonal_order": best["seasonal_order"],
+        "search_seconds": round(search_seconds, 3),
+        "leaderboard": leaderboard,
+    }
+
+def _fit_metrics(fitted_model, iterations, fit_seconds, model_key):
+    return {
+        "model_key": model_key,
+        "nobs": int(fitted_model.nobs),
+        "aic": float(fitted_model.aic),
+        "bic": float(fitted_model.bic),
+        "llf": float(fitted_model.llf),
+        "iterations": iterations,
+        "fit_seconds": round(fit_seconds, 3),
+        "model_version": get_model_version(model_key),
+    }
+
+def _full_refit_due(info):
+    """True when the saved model's parameters were last estimated more than MODEL_FULL_REFIT_DAYS ago."""
+    last_full_fit_at = info.get("last_full_fit_at")
+    return last_full_fit_at is None or time.time() - last_full_fit_at > MODEL_FULL_REFIT_DAYS * 86400
+
+def _append_index(fitted_model, energy, last_seen):
+    """Index statsmodels expects for observations appended to `fitted_model`, or None for a positional model.
+
+    Raises ValueError if the new observations don't continue the trained series without gaps.
+    """
+    import pandas as pd
+    # The model's own index: dated with a frequency, or positional when the dates were irregular
+    model_index = fitted_model.model._index
+    if isinstance(model_index, pd.DatetimeIndex) and model_index.freq is not None:
+        index = pd.date_range(model_index[-1] + model_index.freq, periods=len(energy), freq=model_index.freq)
+        if not index.equals(energy.index):
+            raise ValueError("New observations must continue the trained series without gaps.")
+        return index
+
+    # Positional models only know their last timestamp; new rows must follow it at an even spacing
+    if last_seen is not None:
+        steps = np.diff(energy.index.insert(0, pd.Timestamp(last_seen)).asi8)
+        if len(steps) > 1 and np.any(steps != steps[0]):
+            raise ValueError("New observations must continue the trained series without gaps.")
+    return None
+
+def update_sarimax_model(csv_path, refit=False, progress=None, model_key=DEFAULT_MODEL_KEY):
+    """Extend the saved SARIMAX model with the new observations of a CSV and save it as a new version.
+
+    The fitted parameters are reused, so only the Kalman filter runs over the
+    added rows. Parameters are re-estimated, warm-started from the current
+    ones, when `refit` is set or a scheduled full refit is due.
+    """
+    import pandas as pd
+
+    def report(stage, percent):
+        if progress:
+            progress(stage, percent)
+
+    report("reading", 5)
+
+    fitted_model, energy_scaler, feature_scaler, feature_encoder = load_model(model_key=model_key)
+    if fitted_model is None:
+        raise ValueError("No trained model to append to. Upload the full history first.")
+    info = load_model_info(model_key)
+
+    # New rows are scaled like the data the model was trained on
+    energy, exog, _, _ = load_training_data(csv_path, feature_encoder, scalers=(energy_scaler, feature_scaler))
+
+    # Rows the model has already seen are skipped, so overlapping exports are fine
+    last_seen = info.get("last_timestamp")
+    if last_seen is None and isinstance(fitted_model.model._index, pd.DatetimeIndex):
+        last_seen = fitted_model.model._index[-1]  # Models saved before the info file existed
+    if last_seen is not None:
+        is_new = energy.index > pd.Timestamp(last_seen)
+        energy, exog = energy[is_new], exog[is_new]
+    if energy.empty:
+        raise ValueError("CSV contains no observations newer than the trained model.")
+
+    last_timestamp = energy.index[-1].isoformat()
+    index = _append_index(fitted_model, energy, last_seen)
+    if index is not None:
+        # Named like the model's own data, which statsmodels concatenates them with
+        data = fitted_model.model.data
+        energy = pd.Series(energy.to_numpy(), index=index, name=data.orig_endog.name)
+        exog = pd.DataFrame(exog.to_numpy(), index=index, columns=data.orig_exog.columns)
+    else:
+        energy, exog = energy.to_numpy(), exog.to_numpy()
+
+    refit = refit or _full_refit_due(info)
+    report("refitting" if refit else "appending", 30)
+
+    iterations = [0]
+
+    def on_iteration(params):
+        iterations[0] += 1
+        report("refitting", 30 + int(60 * min(iterations[0] / SARIMAX_MAXITER, 1)))
+
+    fit_started = time.monotonic()
+    if refit:
+        updated_model = _without_callback(fitted_model.append(energy, exog=exog, refit=True, fit_kwargs={
+            "maxiter": SARIMAX_MAXITER, "callback": on_iteration, "disp": False
+        }))
+    else:
+        updated_model = fitted_model.append(energy, exog=exog)
+    fit_seconds = time.monotonic() - fit_started
+
+    report("saving", 95)
+
+    now = time.time()
+    save_model(updated_model, energy_scaler, feature_scaler, feature_encoder, info={
+        "mode": "refit" if refit else "append",
+        "trained_at": now,
+        "last_full_fit_at": now if refit else info.get("last_full_fit_at"),
+        "last_timestamp": last_timestamp,
+        "nobs": int(updated_model.nobs),
+        "appended_since_full_fit": 0 if refit else info.get("appended_since_full_fit", 0) + len(energy),
+        **_model_spec(updated_model),
+    }, model_key=model_key)
+
+    return {**_fit_metrics(updated_model, iterations[0], fit_seconds, model_key), "mode": "refit" if refit else "append", "appended": len(energy)}
+
+def backtest_saved_model(csv_path, folds=BACKTEST_FOLDS, horizon=BACKTEST_HORIZON, refit=True, progress=None, model_key=DEFAULT_MODEL_KEY):
+    """Rolling-origin backtest of the saved model's orders and parameters on a CSV."""
+    model, energy_scaler, feature_scaler, feature_encoder = load_model(model_key=model_key)
+    if model is None:
+        raise ValueError("No trained model found.")
+
+    report = run_backtest(
+        csv_path, model, energy_scaler, feature_scaler, feature_encoder,
+        folds=folds, horizon=horizon, refit=refit,
+        progress=(lambda percent: progress("backtesting", 5 + int(percent * 0.9))) if progress else None
+    )
+    return {**report, "model_key": model_key, "model_version": get_model_version(model_key)}
 
 def get_forecast_history():
     """Retrieve all stored forecasts for dashboard trends."""
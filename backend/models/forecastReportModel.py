@@ -0,0 +1,157 @@
+import os
+import datetime
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from config.db import mongo
+from models.forecastAnalyticsModel import get_user_forecast_stats, ANALYTICS_FEATURES
+
+REPORTS_DIR = "reports"
+
+# Worker processes rendering reports, and the most recent forecasts listed in one
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+REPORT_TABLE_ROWS = int(os.getenv("REPORT_TABLE_ROWS", 500))
+
+_executor = None
+_pending = {}  # Report path -> future, so concurrent downloads share one build
+_lock = threading.Lock()
+
+class ReportFailed(Exception):
+    """Raised when a report could not be rendered."""
+
+class ReportWorkersUnavailable(ReportFailed):
+    """Raised when a report worker died; the pool is replaced, so a retry can succeed."""
+
+def _get_executor():
+    # Called with _lock held
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def report_path(user_id, latest_timestamp):
+    """Cached report path; a new forecast changes the latest timestamp and so the path."""
+    stamp = int(latest_timestamp.timestamp() * 1000) if isinstance(latest_timestamp, datetime.datetime) else str(latest_timestamp)
+    return os.path.join(REPORTS_DIR, f"{user_id}-{stamp}.pdf")
+
+# Forecasts saved before summaries were stored are totalled on the server
+SUMMARY_FIELDS = {
+    "total_forecast_energy": {"$ifNull": ["$total_forecast_energy", {"$sum": "$forecast_data.forecast_energy"}]},
+    "total_energy_savings": {"$ifNull": ["$total_energy_savings", {"$sum": "$forecast_data.energy_savings"}]},
+    "peak_load": {"$ifNull": ["$peak_load", {"$ifNull": [{"$max": "$forecast_data.forecast_energy"}, 0]}]}
+}
+
+def collect_report_data(user_id):
+    """Pre-aggregate everything a report shows, so workers never see raw forecast entries."""
+    match = {"user_id": user_id}
+    stats = get_user_forecast_stats(match, scatter_points=1)
+
+    daily = mongo.db.forecasts.aggregate([
+        {"$match": match},
+        {"$project": {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}}, **SUMMARY_FIELDS}},
+        {"$group": {
+            "_id": "$day",
+            "energy": {"$sum": "$total_forecast_energy"},
+            "savings": {"$sum": "$total_energy_savings"},
+            "forecasts": {"$sum": 1}
+        }},
+        {"$sort": {"_id": 1}}
+    ])
+
+    recent = mongo.db.forecasts.aggregate([
+        {"$match": match},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": REPORT_TABLE_ROWS},
+        {"$project": {"_id": 0, "timestamp": 1, **SUMMARY_FIELDS}}
+    ])
+
+    entry_count = stats["entry_count"]
+    return {
+        "user_id": str(user_id),
+        "generated_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "totals": {
+            "forecasts": stats["forecast_count"],
+            "total_energy": round(stats["total_energy"], 2),
+            "total_savings": round(stats["total_savings"], 2),
+            "avg_peak_load": round(stats["peak_sum"] / entry_count, 2) if entry_count else 0,
+            "max_peak_load": round(stats["peak_max"], 2) if entry_count else 0,
+        },
+        "weekday_energy": [
+            round(stats["weekday_sums"][w] / stats["weekday_counts"][w], 2) if stats["weekday_counts"][w] else 0
+            for w in range(7)
+        ],
+        "avg_factors": {
+            key: round(stats["factor_sums"][key] / stats["factor_counts"][key], 2) if stats["factor_counts"][key] else 0
+            for key in ANALYTICS_FEATURES
+        },
+        "daily": [(day["_id"], day["energy"], day["savings"], day["forecasts"]) for day in daily if day["_id"]],
+        "recent": [
+            (
+                forecast["timestamp"].strftime("%Y-%m-%d %H:%M") if isinstance(forecast.get("timestamp"), datetime.datetime) else str(forecast.get("timestamp", "")),
+                round(forecast["total_forecast_energy"], 2),
+                round(forecast["total_energy_savings"], 2),
+                round(forecast["peak_load"], 2)
+            )
+            for forecast in recent
+        ],
+    }
+
+def _render_report(path, report):
+    """Worker entry point; matplotlib and reportlab are only imported by the report workers."""
+    from models.reportRenderer import render_report_pdf
+    return render_report_pdf(path, report)
+
+def _on_report_done(path, executor, future):
+    global _executor
+    with _lock:
+        if _pending.get(path) is future:
+            del _pending[path]
+        # A worker died hard; the next report starts a fresh pool
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool) and _executor is executor:
+            _executor = None
+
+def _submit(path, report):
+    """Start rendering a report; called with _lock held."""
+    global _executor
+    try:
+        executor = _get_executor()
+        future = executor.submit(_render_report, path, report)
+    except BrokenProcessPool:
+        _executor = None
+        executor = _get_executor()
+        future = executor.submit(_render_report, path, report)
+    _pending[path] = future
+    future.add_done_callback(lambda f: _on_report_done(path, executor, f))
+    return future
+
+def get_report(user_id, latest_timestamp, wait_seconds):
+    """Return the path of the user's report, building it in the worker pool if needed.
+
+    Returns None if the report is still being generated after `wait_seconds`.
+    Raises ReportFailed if rendering failed, or ReportWorkersUnavailable if
+    its worker died.
+    """
+    path = report_path(user_id, latest_timestamp)
+    if os.path.exists(path):
+        return path
+
+    with _lock:
+        future = _pending.get(path)
+
+    if future is None:
+        report = collect_report_data(user_id)
+        with _lock:
+            future = _pending.get(path)
+            if future is None:
+                future = _submit(path, report)
+
+    try:
+        return future.result(timeout=wait_seconds)
+    except TimeoutError:
+        return None
+    except BrokenProcessPool as e:
+        raise ReportWorkersUnavailable(str(e) or "Report worker stopped unexpectedly.")
+    except Exception as e:
+        print(f"Error rendering report {path}: {str(e)}")
+        raise ReportFailed(str(e))
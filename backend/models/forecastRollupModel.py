@@ -0,0 +1,157 @@
+import math
+import numpy as np
+from pymongo import UpdateOne
+from config.db import mongo
+from models.featureEncoder import FEATURE_COLUMNS
+from models.forecastStorageModel import FORECAST_DATA_PROJECTION, unpack_forecast_data
+
+GLOBAL_ROLLUP_ID = "global"
+
+def summarize_forecast(forecast_data):
+    """Return the totals of one forecast's forecast_data entries."""
+    feature_sums = {key: 0 for key in FEATURE_COLUMNS}
+    total_energy = 0
+    total_savings = 0
+    peak_load = 0
+
+    for entry in forecast_data:
+        total_energy += entry["forecast_energy"]
+        total_savings += entry["energy_savings"]
+        peak_load = max(peak_load, entry["forecast_energy"])
+        features = entry.get("feature_contributions", {})
+        for key in feature_sums:
+            feature_sums[key] += features.get(key, 0)
+
+    return {
+        "total_forecast_energy": float(total_energy),
+        "total_energy_savings": float(total_savings),
+        "peak_load": float(peak_load),
+        "entry_count": len(forecast_data),
+        "feature_sums": {key: float(value) for key, value in feature_sums.items()},
+    }
+
+def summarize_forecast_columns(energy, savings, contributions, columns=FEATURE_COLUMNS):
+    """Return the same totals as summarize_forecast from per-hour columns (contributions is hours x features)."""
+    energy = np.asarray(energy, dtype=np.float64)
+    savings = np.asarray(savings, dtype=np.float64)
+    contributions = np.asarray(contributions, dtype=np.float64).reshape(len(energy), len(columns))
+    if not len(energy):
+        return summarize_forecast([])
+
+    # cumsum adds in order, so the totals match summarize_forecast's loop to the last bit
+    feature_sums = dict.fromkeys(FEATURE_COLUMNS, 0.0)
+    for col, total in zip(columns, np.cumsum(contributions, axis=0)[-1].tolist()):
+        if col in feature_sums:
+            feature_sums[col] = total
+    return {
+        "total_forecast_energy": float(np.cumsum(energy)[-1]),
+        "total_energy_savings": float(np.cumsum(savings)[-1]),
+        "peak_load": max(float(energy.max()), 0.0),
+        "entry_count": len(energy),
+        "feature_sums": feature_sums,
+    }
+
+def _finite(value):
+    # A NaN or infinity added to a rollup would stay in its totals for good
+    return value if math.isfinite(value) else 0.0
+
+def _rollup_increments(summaries):
+    """Combine forecast summaries into one $inc document, skipping non-finite values."""
+    increments = {
+        "forecast_count": 0, "entry_count": 0, "total_energy": 0.0,
+        "total_energy_savings": 0.0, "peak_load_sum": 0.0,
+    }
+    for key in FEATURE_COLUMNS:
+        increments[f"feature_sums.{key}"] = 0.0
+
+    for summary in summaries:
+        increments["forecast_count"] += 1
+        increments["entry_count"] += summary["entry_count"]
+        increments["total_energy"] += _finite(summary["total_forecast_energy"])
+        increments["total_energy_savings"] += _finite(summary["total_energy_savings"])
+        increments["peak_load_sum"] += _finite(summary["peak_load"])
+        for key, value in summary["feature_sums"].items():
+            increments[f"feature_sums.{key}"] += _finite(value)
+    return increments
+
+def update_forecast_rollups(user_id, summaries):
+    """Add newly inserted forecasts of one user to the global and per-user rollups."""
+    if not summaries:
+        return
+
+    increments = _rollup_increments(summaries)
+    result = mongo.db.forecast_rollups.update_one(
+        {"_id": f"user:{user_id}"},
+        {"$inc": increments, "$set": {"user_id": user_id, "kind": "user"}},
+        upsert=True
+    )
+
+    # A new per-user rollup means one more user has forecasted
+    global_increments = dict(increments)
+    if result.upserted_id is not None:
+        global_increments["users_forecasting"] = 1
+
+    mongo.db.forecast_rollups.update_one(
+        {"_id": GLOBAL_ROLLUP_ID},
+        {"$inc": global_increments, "$set": {"kind": "global"}},
+        upsert=True
+    )
+
+def get_forecast_rollup(user_id=None):
+    """Return the global rollup, or one user's rollup, as plain totals."""
+    rollup_id = f"user:{user_id}" if user_id is not None else GLOBAL_ROLLUP_ID
+    return mongo.db.forecast_rollups.find_one({"_id": rollup_id}) or {}
+
+def _add_increments(totals, increments):
+    for key, value in increments.items():
+        totals[key] = totals.get(key, 0) + value
+
+def rebuild_forecast_rollups(batch_size=1000):
+    """Recompute every rollup and per-forecast summary from the forecasts collection.
+
+    Used to backfill forecasts saved before rollups existed. Run it while
+    forecasts are not being written, since live increments are replaced.
+    """
+    per_user = {}
+    updates = []
+
+    cursor = mongo.db.forecasts.find({}, {"user_id": 1, **FORECAST_DATA_PROJECTION}).batch_size(batch_size)
+    for forecast in cursor:
+        summary = summarize_forecast(unpack_forecast_data(forecast))
+        _add_increments(per_user.setdefault(forecast["user_id"], {}), _rollup_increments([summary]))
+
+        updates.append(UpdateOne({"_id": forecast["_id"]}, {"$set": {
+            "total_forecast_energy": summary["total_forecast_energy"],
+            "total_energy_savings": summary["total_energy_savings"],
+            "peak_load": summary["peak_load"],
+        }}))
+        if len(updates) >= batch_size:
+            mongo.db.forecasts.bulk_write(updates, ordered=False)
+            updates = []
+
+    if updates:
+        mongo.db.forecasts.bulk_write(updates, ordered=False)
+
+    totals = {}
+    rollups = []
+    for user_id, increments in per_user.items():
+        rollups.append({"_id": f"user:{user_id}", "kind": "user", "user_id": user_id, **_expand(increments)})
+        _add_increments(totals, increments)
+    totals["users_forecasting"] = len(per_user)
+
+    mongo.db.forecast_rollups.delete_many({})
+    if rollups:
+        mongo.db.forecast_rollups.insert_many(rollups)
+    mongo.db.forecast_rollups.insert_one({"_id": GLOBAL_ROLLUP_ID, "kind": "global", **_expand(totals)})
+    return len(per_user)
+
+def _expand(increments):
+    """Turn dotted $inc keys into a nested document."""
+    document = {}
+    for key, value in increments.items():
+        if "." in key:
+            parent, child = key.split(".", 1)
+            document.setdefault(parent, {})[child] = value
+        else:
+            document[key] = value
+    return document
@@ -0,0 +1,135 @@
+import datetime
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+from config.db import mongo
+from models.featureEncoder import FEATURE_COLUMNS
+
+# Compact forecast documents store per-hour values as parallel columns:
+#   start / step_seconds    regular naive timestamps (else "timestamps": ISO strings)
+#   energy / savings        forecast_energy and energy_savings arrays
+#   features                feature order of the contribution matrix, stored once
+#   contributions           row-major little-endian float32 matrix (hours x features)
+#   contribution_sums       per-feature totals, so aggregations never decode the matrix
+STORAGE_SCHEMA_VERSION = 2
+CONTRIBUTION_DTYPE = np.dtype("<f4")
+
+# Fields needed to rebuild forecast_data from either schema
+FORECAST_DATA_PROJECTION = {
+    "forecast_data": 1, "start": 1, "step_seconds": 1, "timestamps": 1,
+    "energy": 1, "savings": 1, "peak_load": 1, "features": 1, "contributions": 1
+}
+
+def _regular_timestamps(timestamps):
+    """Return (start, step_seconds) if the ISO timestamps can be regenerated exactly, else (None, None)."""
+    try:
+        dates = [datetime.datetime.fromisoformat(ts) for ts in timestamps]
+    except (TypeError, ValueError):
+        return None, None
+
+    if not dates or any(date.tzinfo is not None or date.microsecond or date.isoformat() != ts for date, ts in zip(dates, timestamps)):
+        return None, None
+
+    step = (dates[1] - dates[0]).total_seconds() if len(dates) > 1 else 0
+    if step != int(step) or any((later - earlier).total_seconds() != step for earlier, later in zip(dates, dates[1:])):
+        return None, None
+
+    return dates[0], int(step)
+
+def pack_forecast_data(forecast_data, columns=FEATURE_COLUMNS):
+    """Convert a forecast_data list into the compact columnar fields of a forecast document."""
+    columns = list(columns)
+    return pack_forecast_columns(
+        [entry["timestamp"] for entry in forecast_data],
+        [entry["forecast_energy"] for entry in forecast_data],
+        [entry["energy_savings"] for entry in forecast_data],
+        [[entry.get("feature_contributions", {}).get(col, 0.0) for col in columns] for entry in forecast_data],
+        columns
+    )
+
+def pack_forecast_columns(timestamps, energy, savings, contributions, columns=FEATURE_COLUMNS):
+    """Build the compact columnar fields from per-hour columns (contributions is hours x features)."""
+    columns = list(columns)
+    contributions = np.array(contributions, dtype=np.float64).reshape(len(timestamps), len(columns))
+
+    packed = {
+        "schema": STORAGE_SCHEMA_VERSION,
+        "energy": np.asarray(energy, dtype=np.float64).tolist(),
+        "savings": np.asarray(savings, dtype=np.float64).tolist(),
+        "features": columns,
+        "contributions": Binary(contributions.astype(CONTRIBUTION_DTYPE).tobytes()),
+        "contribution_sums": {col: float(total) for col, total in zip(columns, contributions.sum(axis=0))},
+    }
+
+    timestamps = list(timestamps)
+    start, step_seconds = _regular_timestamps(timestamps)
+    if start is not None:
+        packed["start"] = start
+        packed["step_seconds"] = step_seconds
+    else:
+        packed["timestamps"] = timestamps
+
+    return packed
+
+def decode_contributions(document):
+    """Return the contribution matrix of a compact document as float64 (hours x features)."""
+    matrix = np.frombuffer(document["contributions"], dtype=CONTRIBUTION_DTYPE)
+    return matrix.reshape(-1, len(document["features"])).astype(np.float64)
+
+def unpack_forecast_data(document):
+    """Return the forecast_data list of a forecast document, whichever schema it uses."""
+    if "forecast_data" in document:
+        return document["forecast_data"]
+    if "energy" not in document:
+        return []
+
+    count = len(document["energy"])
+    if "timestamps" in document:
+        timestamps = document["timestamps"]
+    else:
+        start, step = document["start"], datetime.timedelta(seconds=document["step_seconds"])
+        timestamps = [(start + step * i).isoformat() for i in range(count)]
+
+    features = document["features"]
+    contributions = np.round(decode_contributions(document), 2).tolist()
+    peak_load = round(document.get("peak_load", max(document["energy"], default=0)), 2)
+
+    return [
+        {
+            "timestamp": ts,
+            "forecast_energy": energy,
+            "energy_savings": savings,
+            "peak_load": peak_load,
+            "feature_contributions": dict(zip(features, row))
+        }
+        for ts, energy, savings, row in zip(timestamps, document["energy"], document["savings"], contributions)
+    ]
+
+def migrate_forecast_storage(batch_size=500):
+    """Convert forecast documents that still embed forecast_data to the compact schema. Returns the count."""
+    migrated = 0
+    updates = []
+
+    projection = {"forecast_data": 1, "total_forecast_energy": 1, "total_energy_savings": 1, "peak_load": 1}
+    cursor = mongo.db.forecasts.find({"forecast_data": {"$exists": True}}, projection).batch_size(batch_size)
+    for document in cursor:
+        forecast_data = document["forecast_data"]
+        columns = list(forecast_data[0].get("feature_contributions", {})) if forecast_data else FEATURE_COLUMNS
+        packed = pack_forecast_data(forecast_data, columns or FEATURE_COLUMNS)
+
+        # Summaries replace the server-side totals of forecast_data once it is gone
+        summaries = {
+            "total_forecast_energy": sum(packed["energy"]),
+            "total_energy_savings": sum(packed["savings"]),
+            "peak_load": max(packed["energy"], default=0),
+        }
+        packed.update({key: value for key, value in summaries.items() if document.get(key) is None})
+
+        updates.append(UpdateOne({"_id": document["_id"]}, {"$set": packed, "$unset": {"forecast_data": ""}}))
+        if len(updates) >= batch_size:
+            migrated += mongo.db.forecasts.bulk_write(updates, ordered=False).modified_count
+            updates = []
+
+    if updates:
+        migrated += mongo.db.forecasts.bulk_write(updates, ordered=False).modified_count
+    return migrated
@@ -0,0 +1,162 @@
+import os
+import random
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ReturnDocument
+from flask_mail import Message
+from config.db import mongo
+
+# Outgoing mail is stored in the mail_outbox collection and sent by a background
+# dispatcher in each web process, so requests never wait for the mail server:
+#   status          "pending" -> "sending" -> "sent", or "failed" after MAIL_MAX_ATTEMPTS
+#   attempts        leases taken so far, counted when a message is leased
+#   next_attempt_at when a pending message may be sent (retries back off exponentially)
+#   locked_until    lease of a "sending" message; expired leases (a crashed process) are retried
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", 2))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 20))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", 6))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", 30))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", 3600))
+MAIL_LEASE_SECONDS = float(os.getenv("MAIL_LEASE_SECONDS", 300))
+MAIL_POLL_SECONDS = float(os.getenv("MAIL_POLL_SECONDS", 5))
+
+_mail = None
+_wake = threading.Event()
+_start_lock = threading.Lock()
+_started_pid = None  # Dispatcher threads don't survive a fork, so each process starts its own
+
+def enqueue_mail(recipients, subject, html, sender=None):
+    """Store a message in the outbox and wake the dispatcher; returns the outbox id."""
+    now = datetime.datetime.now()
+    result = mongo.db.mail_outbox.insert_one({
+        "recipients": list(recipients),
+        "subject": subject,
+        "html": html,
+        "sender": sender,
+        "status": "pending",
+        "attempts": 0,
+        "created_at": now,
+        "next_attempt_at": now,
+    })
+    _wake.set()
+    return result.inserted_id
+
+def retry_delay(attempts):
+    """Seconds before the next attempt after `attempts` failures: exponential, capped, with jitter."""
+    delay = min(MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAIL_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+def _claim_batch():
+    """Atomically lease up to MAIL_BATCH_SIZE due messages for this process."""
+    batch = []
+    now = datetime.datetime.now()
+    # A sender that crashed or hung on the last allowed attempt gets no more
+    mongo.db.mail_outbox.update_many(
+        {"status": "sending", "locked_until": {"$lt": now}, "attempts": {"$gte": MAIL_MAX_ATTEMPTS}},
+        {"$set": {"status": "failed", "last_error": "Lease expired before the message was sent"}, "$unset": {"locked_until": ""}}
+    )
+    while len(batch) < MAIL_BATCH_SIZE:
+        message = mongo.db.mail_outbox.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "locked_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {"status": "sending", "locked_until": now + datetime.timedelta(seconds=MAIL_LEASE_SECONDS)},
+                "$inc": {"attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if message is None:
+            break
+        batch.append(message)
+    return batch
+
+def _record_sent(message):
+    mongo.db.mail_outbox.update_one({"_id": message["_id"]}, {
+        "$set": {"status": "sent", "sent_at": datetime.datetime.now()},
+        "$unset": {"locked_until": "", "last_error": ""}
+    })
+
+def _record_failure(message, error):
+    attempts = message["attempts"]  # Counted when the message was leased
+    update = {"last_error": str(error)}
+    if attempts >= MAIL_MAX_ATTEMPTS:
+        update["status"] = "failed"
+        print(f"Giving up on email {message['_id']} after {attempts} attempts: {str(error)}")
+    else:
+        update["status"] = "pending"
+        update["next_attempt_at"] = datetime.datetime.now() + datetime.timedelta(seconds=retry_delay(attempts))
+    mongo.db.mail_outbox.update_one({"_id": message["_id"]}, {"$set": update, "$unset": {"locked_until": ""}})
+
+def _send_batch(app, batch):
+    """Send a batch of outbox messages over one SMTP connection."""
+    done = set()
+    try:
+        with app.app_context(), _mail.connect() as connection:
+            for message in batch:
+                try:
+                    connection.send(Message(
+                        message["subject"],
+                        sender=message.get("sender"),
+                        recipients=message["recipients"],
+                        html=message["html"]
+                    ))
+                except Exception as e:
+                    _record_failure(message, e)
+                else:
+                    _record_sent(message)
+                done.add(message["_id"])
+    except Exception as e:
+        # Connecting (or closing) failed; whatever wasn't handled is retried later
+        print("Error sending email:", e)
+        for message in batch:
+            if message["_id"] not in done:
+                _record_failure(message, e)
+
+def _dispatch(app):
+    """Dispatcher thread: hand due messages to at most MAIL_WORKERS concurrent senders."""
+    executor = ThreadPoolExecutor(max_workers=MAIL_WORKERS, thread_name_prefix="mail")
+    slots = threading.BoundedSemaphore(MAIL_WORKERS)
+    with app.app_context():
+        while True:
+            # Cleared before claiming, so mail enqueued while this pass runs wakes the next one
+            _wake.clear()
+            try:
+                while True:
+                    slots.acquire()
+                    try:
+                        batch = _claim_batch()
+                    except Exception:
+                        slots.release()
+                        raise
+                    if not batch:
+                        slots.release()
+                        break
+                    executor.submit(_send_batch, app, batch).add_done_callback(lambda _: slots.release())
+            except Exception as e:
+                # e.g. the database is unreachable; try again on the next poll
+                print("Error dispatching emails:", e)
+
+            _wake.wait(MAIL_POLL_SECONDS)
+
+def _ensure_dispatcher(app):
+    global _started_pid
+    if _started_pid == os.getpid():
+        return
+    with _start_lock:
+        if _started_pid != os.getpid():
+            threading.Thread(target=_dispatch, args=(app,), name="mail-dispatcher", daemon=True).start()
+            _started_pid = os.getpid()
+
+def init_mail_queue(app, mail):
+    """Send queued mail with `mail` (a Flask-Mail instance) from each process serving requests.
+
+    The dispatcher starts with the first request of a process, which then
+    also picks up messages left in the outbox by earlier runs.
+    """
+    global _mail
+    _mail = mail
+    app.before_request(lambda: _ensure_dispatcher(app))
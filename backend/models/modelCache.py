@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+
+# Loaded models kept per worker process, bounded by count and by approximate memory
+MODEL_CACHE_MAX_MODELS = int(os.getenv("MODEL_CACHE_MAX_MODELS", 50))
+MODEL_CACHE_MAX_BYTES = int(float(os.getenv("MODEL_CACHE_MAX_MB", 1024)) * 1024 * 1024)
+
+def model_nbytes(fitted_model):
+    """Approximate private memory of a loaded model: for SARIMAX results, their in-memory NumPy arrays.
+
+    Memory-mapped training data is left out, since worker processes share its pages.
+    Exported predictors report their own size.
+    """
+    if hasattr(fitted_model, "nbytes"):
+        return fitted_model.nbytes
+    holders = [fitted_model, getattr(fitted_model, "filter_results", None), fitted_model.model, getattr(fitted_model.model, "ssm", None)]
+    seen = set()
+    total = 0
+    for holder in holders:
+        for value in getattr(holder, "__dict__", {}).values():
+            if isinstance(value, np.ndarray) and not isinstance(value, np.memmap) and id(value) not in seen:
+                seen.add(id(value))
+                total += value.nbytes
+    return total
+
+class ModelCache:
+    """LRU of loaded models by model key, evicting least recently used ones past its limits."""
+
+    def __init__(self, max_models=MODEL_CACHE_MAX_MODELS, max_bytes=MODEL_CACHE_MAX_BYTES):
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> {"version", "models", "nbytes", "checked_at"}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}  # key -> [lock, threads holding or waiting for it]
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "evicted_bytes": 0}
+
+    @contextmanager
+    def key_lock(self, key):
+        """Hold the lock serializing loads of one key, so concurrent requests load it once.
+
+        Locks live while a thread holds or waits for them, independent of the
+        cached entries, and are dropped once no thread does.
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                yield
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    def get(self, key, record=True):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            if record:
+                self._stats["hits" if entry is not None else "misses"] += 1
+            return entry
+
+    def put(self, key, version, models, nbytes, checked_at):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous["nbytes"]
+
+            self._entries[key] = {"version": version, "models": models, "nbytes": nbytes, "checked_at": checked_at}
+            self._bytes += nbytes
+            self._stats["loads"] += 1
+
+            # The entry just loaded always stays, even if it alone exceeds the limit
+            while len(self._entries) > 1 and (len(self._entries) > self.max_models or self._bytes > self.max_bytes):
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["nbytes"]
+                self._stats["evictions"] += 1
+                self._stats["evicted_bytes"] += evicted["nbytes"]
+
+    def discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry["nbytes"]
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "keys": list(self._entries),
+            }
@@ -0,0 +1,289 @@
+import os
+import re
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+from models.featureEncoder import FeatureEncoder
+from models.statePredictor import StateSpacePredictor, PREDICTOR_CHECK_STEPS
+
+# Every building/tenant model key has its own directory under REGISTRY_DIR, and
+# every model saved for a key gets an immutable version directory in it:
+#   manifest.json   orders, SARIMAX options, training index, encoder, scaler metadata, training info
+#   params.npy      fitted parameters
+#   endog.npy       scaled training target, exog.npy scaled training features
+#   scalers.npz     MinMaxScaler arrays
+#   predictor.npz   exported StateSpacePredictor, when the model supports it
+# The key's CURRENT file names the served version and PREVIOUS the one served
+# before it; both are replaced atomically.
+REGISTRY_DIR = "models/trainedDataForecast/registry"
+ARTIFACT_FORMAT = 1
+
+# Key used when a request doesn't name a building or tenant
+DEFAULT_MODEL_KEY = "default"
+MODEL_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Versions kept on disk (the current, previous and rollback versions are never removed)
+MODEL_REGISTRY_KEEP = int(os.getenv("MODEL_REGISTRY_KEEP", 10))
+
+# SARIMAX constructor options recorded so the model can be rebuilt from its arrays
+SARIMAX_OPTIONS = (
+    "trend", "measurement_error", "time_varying_regression", "mle_regression", "simple_differencing",
+    "enforce_stationarity", "enforce_invertibility", "hamilton_representation", "concentrate_scale"
+)
+SCALER_ARRAYS = ("min_", "scale_", "data_min_", "data_max_", "data_range_")
+
+def is_valid_key(key):
+    return isinstance(key, str) and MODEL_KEY_PATTERN.match(key) is not None
+
+def _key_dir(key):
+    if not is_valid_key(key):
+        raise ValueError(f"Invalid model key: {key}")
+    return os.path.join(REGISTRY_DIR, key)
+
+def _version_dir(version, key):
+    return os.path.join(_key_dir(key), version)
+
+def _read_pointer(key, name):
+    try:
+        with open(os.path.join(_key_dir(key), name)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def current_version(key=DEFAULT_MODEL_KEY):
+    """Return the version the key's CURRENT points to, or None if it has no model."""
+    return _read_pointer(key, "CURRENT")
+
+def _write_atomically(path, write):
+    """Create `path` by calling `write(tmp_path)` on a unique temporary file and renaming it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _write_text(path, text):
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            f.write(text)
+    _write_atomically(path, write)
+
+def _set_current(version, key):
+    previous = current_version(key)
+    if previous is not None and previous != version:
+        _write_text(os.path.join(_key_dir(key), "PREVIOUS"), previous)
+    _write_text(os.path.join(_key_dir(key), "CURRENT"), version)
+
+def list_keys():
+    """Return the model keys that have a current version."""
+    if not os.path.isdir(REGISTRY_DIR):
+        return []
+    return sorted(key for key in os.listdir(REGISTRY_DIR) if is_valid_key(key) and current_version(key))
+
+def list_versions(key=DEFAULT_MODEL_KEY):
+    """Return the key's saved versions, oldest first."""
+    key_dir = _key_dir(key)
+    if not os.path.isdir(key_dir):
+        return []
+    versions = [name for name in os.listdir(key_dir) if name.isdigit() and os.path.isdir(os.path.join(key_dir, name))]
+    return sorted(versions, key=int)
+
+def read_manifest(version, key=DEFAULT_MODEL_KEY):
+    with open(os.path.join(_version_dir(version, key), "manifest.json")) as f:
+        return json.load(f)
+
+def _scaler_metadata(scaler):
+    return {"feature_range": list(scaler.feature_range), "n_samples_seen": int(np.max(scaler.n_samples_seen_))}
+
+def _load_scaler(arrays, prefix, metadata):
+    from sklearn.preprocessing import MinMaxScaler
+    scaler = MinMaxScaler(feature_range=tuple(metadata["feature_range"]))
+    for name in SCALER_ARRAYS:
+        setattr(scaler, name, np.array(arrays[f"{prefix}_{name}"]))
+    scaler.n_features_in_ = len(scaler.scale_)
+    scaler.n_samples_seen_ = metadata["n_samples_seen"]
+    return scaler
+
+def _export_predictor(fitted_model, path):
+    """Export and check the NumPy forecaster of a model into `path`; returns the manifest entry."""
+    exog = fitted_model.model.data.orig_exog
+    try:
+        predictor = StateSpacePredictor.from_results(fitted_model)
+        # Checked against statsmodels on the last training rows' features
+        max_abs_diff = predictor.check_against(fitted_model, None if exog is None else np.asarray(exog)[-PREDICTOR_CHECK_STEPS:])
+    except ValueError as e:
+        print(f"Predictor export skipped: {str(e)}")
+        return {"exported": False, "error": str(e)}
+
+    _write_atomically(path, predictor.save)
+    return {"exported": True, "max_abs_diff": max_abs_diff, "nbytes": predictor.nbytes}
+
+def _index_metadata(model):
+    """Start and frequency of a model's dated index, or None for a positional one."""
+    import pandas as pd
+    index = model._index
+    if isinstance(index, pd.DatetimeIndex) and index.freq is not None:
+        return {"start": index[0].isoformat(), "freq": index.freqstr}
+    return None
+
+def _training_index(manifest, nobs):
+    """Rebuild the dated index recorded in a manifest; None for positional models and versions saved without one."""
+    if manifest.get("index") is None:
+        return None
+    import pandas as pd
+    return pd.date_range(manifest["index"]["start"], periods=nobs, freq=manifest["index"]["freq"], name="Timestamp")
+
+def publish_version(fitted_model, energy_scaler, feature_scaler, feature_encoder, info=None, key=DEFAULT_MODEL_KEY):
+    """Write a fitted SARIMAX model as a new version of `key` and make it current. Returns the version."""
+    model = fitted_model.model
+    version = str(time.time_ns())
+
+    # Build the version in a hidden directory and rename it into place in one step
+    tmp_dir = os.path.join(_key_dir(key), f".tmp-{version}")
+    os.makedirs(tmp_dir)
+    try:
+        np.save(os.path.join(tmp_dir, "params.npy"), np.asarray(fitted_model.params, dtype=np.float64))
+        # The original (undifferenced) data, as passed to the SARIMAX constructor
+        np.save(os.path.join(tmp_dir, "endog.npy"), np.asarray(model.data.orig_endog, dtype=np.float64))
+        if model.data.orig_exog is not None:
+            np.save(os.path.join(tmp_dir, "exog.npy"), np.asarray(model.data.orig_exog, dtype=np.float64))
+        np.savez(
+            os.path.join(tmp_dir, "scalers.npz"),
+            **{f"energy_{name}": getattr(energy_scaler, name) for name in SCALER_ARRAYS},
+            **{f"feature_{name}": getattr(feature_scaler, name) for name in SCALER_ARRAYS}
+        )
+
+        predictor = _export_predictor(fitted_model, os.path.join(tmp_dir, "predictor.npz"))
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": version,
+            "model_key": key,
+            "created_at": time.time(),
+            "order": list(model.order),
+            "seasonal_order": list(model.seasonal_order),
+            "options": {name: getattr(model, name) for name in SARIMAX_OPTIONS if hasattr(model, name)},
+            "index": _index_metadata(model),
+            "param_names": list(model.param_names),
+            "encoder": feature_encoder.__getstate__(),
+            "scalers": {"energy": _scaler_metadata(energy_scaler), "feature": _scaler_metadata(feature_scaler)},
+            "predictor": predictor,
+            "info": {**(info or {}), "model_version": version},
+        }
+        with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+        os.rename(tmp_dir, _version_dir(version, key))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _set_current(version, key)
+    prune_versions(key=key)
+    return version
+
+def load_version(version, key=DEFAULT_MODEL_KEY, low_memory=True):
+    """Rebuild (model, energy_scaler, feature_scaler, feature_encoder) from a version of `key`.
+
+    Training arrays are memory-mapped copy-on-write, so worker processes
+    loading the same version share the file's pages. With `low_memory` the
+    Kalman filter keeps only its final state instead of its output for
+    every row; that is all forecasting, appending and predictor export use.
+    Raises FileNotFoundError if the version was pruned.
+    """
+    path = _version_dir(version, key)
+    manifest = read_manifest(version, key)
+
+    params = np.load(os.path.join(path, "params.npy"))
+    endog = np.load(os.path.join(path, "endog.npy"), mmap_mode="c")
+    exog_path = os.path.join(path, "exog.npy")
+    exog = np.load(exog_path, mmap_mode="c") if os.path.exists(exog_path) else None
+
+    # Dated models get their index back, so appended rows are checked for gaps
+    index = _training_index(manifest, len(endog))
+    if index is not None:
+        import pandas as pd
+        endog = pd.Series(endog.ravel(), index=index, copy=False)  # Appended models saved it as one column
+        exog = None if exog is None else pd.DataFrame(exog, index=index, copy=False)
+
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    model = SARIMAX(
+        endog,
+        exog=exog,
+        order=tuple(manifest["order"]),
+        seasonal_order=tuple(manifest["seasonal_order"]),
+        **manifest["options"]
+    )
+    fitted_model = model.filter(params, low_memory=low_memory)
+    return (fitted_model, *_load_preprocessing(path, manifest))
+
+def _load_preprocessing(path, manifest):
+    """Return the (energy_scaler, feature_scaler, feature_encoder) of a version."""
+    with np.load(os.path.join(path, "scalers.npz")) as arrays:
+        energy_scaler = _load_scaler(arrays, "energy", manifest["scalers"]["energy"])
+        feature_scaler = _load_scaler(arrays, "feature", manifest["scalers"]["feature"])
+    return energy_scaler, feature_scaler, FeatureEncoder(**manifest["encoder"])
+
+def load_predictor(version, key=DEFAULT_MODEL_KEY):
+    """Return (predictor, energy_scaler, feature_scaler, feature_encoder) of a version, or None if it has no exported predictor.
+
+    Serving needs only these few arrays, not the training data or statsmodels.
+    """
+    path = _version_dir(version, key)
+    predictor_path = os.path.join(path, "predictor.npz")
+    if not os.path.exists(predictor_path):
+        return None
+    try:
+        predictor = StateSpacePredictor.load(predictor_path)
+    except ValueError as e:
+        print(f"Predictor of model version {version} not used: {str(e)}")
+        return None
+    return (predictor, *_load_preprocessing(path, read_manifest(version, key)))
+
+def export_predictor(version, key=DEFAULT_MODEL_KEY):
+    """Export the predictor of a version saved without one; returns its manifest entry."""
+    if version not in list_versions(key):
+        raise ValueError(f"Unknown model version: {version}")
+    path = _version_dir(version, key)
+    fitted_model = load_version(version, key)[0]
+    predictor = _export_predictor(fitted_model, os.path.join(path, "predictor.npz"))
+
+    manifest = {**read_manifest(version, key), "predictor": predictor}
+    _write_text(os.path.join(path, "manifest.json"), json.dumps(manifest))
+    return predictor
+
+def _rollback_target(versions, current):
+    """The version saved before `current`, which rollback serves by default."""
+    older = [v for v in versions if current is None or int(v) < int(current)]
+    return older[-1] if older else None
+
+def rollback(version=None, key=DEFAULT_MODEL_KEY):
+    """Point the key's CURRENT at `version`, or at the version saved before the current one. Returns it."""
+    versions = list_versions(key)
+    if version is None:
+        version = _rollback_target(versions, current_version(key))
+        if version is None:
+            raise ValueError("No earlier model version to roll back to.")
+    elif version not in versions:
+        raise ValueError(f"Unknown model version: {version}")
+
+    _set_current(version, key)
+    return version
+
+def prune_versions(keep=MODEL_REGISTRY_KEEP, key=DEFAULT_MODEL_KEY):
+    """Delete the key's oldest versions beyond `keep`.
+
+    Never removes the current version, the previous one (other processes may
+    still be loading it) or the version a rollback would serve.
+    """
+    versions = list_versions(key)
+    current = current_version(key)
+    kept = {current, _read_pointer(key, "PREVIOUS"), _rollback_target(versions, current)}
+    for version in versions[:-keep or None]:
+        if version not in kept:
+            shutil.rmtree(_version_dir(version, key), ignore_errors=True)
@@ -0,0 +1,123 @@
+import os
+import time
+import itertools
+import multiprocessing
+import numpy as np
+
+# Candidate (p,d,q)(P,D,Q,s) orders evaluated by a search
+SEARCH_CANDIDATES = [
+    ((p, 1, q), (P, 1, Q, 24))
+    for p, q, P, Q in itertools.product((1, 2, 5), (0, 1), (0, 1), (0, 1))
+]
+
+# Worker processes, total wall-clock budget, and the short screening fit every candidate gets
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", os.cpu_count() or 1))
+SEARCH_BUDGET_SECONDS = float(os.getenv("SEARCH_BUDGET_SECONDS", 1800))
+SEARCH_SCREEN_MAXITER = int(os.getenv("SEARCH_SCREEN_MAXITER", 10))
+# Candidates screening more than this much AIC above the best are dropped, the rest fitted fully
+SEARCH_AIC_MARGIN = float(os.getenv("SEARCH_AIC_MARGIN", 10))
+SEARCH_FINALISTS = int(os.getenv("SEARCH_FINALISTS", 4))
+
+_search_data = None  # (energy, exog) shipped once to each worker process
+
+def _init_worker(energy, exog):
+    global _search_data
+    _search_data = (energy, exog)
+
+def _fit_candidate(order, seasonal_order, maxiter, start_params):
+    """Worker entry point: fit one candidate and return its scores and parameters."""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    energy, exog = _search_data
+    result = {"order": list(order), "seasonal_order": list(seasonal_order)}
+    started = time.monotonic()
+    try:
+        fitted = SARIMAX(energy, exog=exog, order=order, seasonal_order=seasonal_order).fit(
+            start_params=start_params, maxiter=maxiter, disp=False
+        )
+    except Exception as e:
+        return {**result, "status": "failed", "error": str(e), "fit_seconds": round(time.monotonic() - started, 3)}
+
+    aic = float(fitted.aic)
+    return {
+        **result,
+        "status": "fitted" if np.isfinite(aic) else "failed",
+        "aic": aic,
+        "bic": float(fitted.bic),
+        "converged": bool(fitted.mle_retvals.get("converged", False)),
+        "params": np.asarray(fitted.params, dtype=np.float64).tolist(),
+        "fit_seconds": round(time.monotonic() - started, 3),
+    }
+
+def _run_phase(pool, tasks, deadline, on_result=None):
+    """Fit `tasks` in the pool; candidates still running at the deadline are marked timed out."""
+    pending = [(task, pool.apply_async(_fit_candidate, task)) for task in tasks]
+    results = []
+    for (order, seasonal_order, _, _), async_result in pending:
+        try:
+            result = async_result.get(timeout=max(deadline - time.monotonic(), 0))
+        except multiprocessing.TimeoutError:
+            result = {"order": list(order), "seasonal_order": list(seasonal_order), "status": "timed_out"}
+        results.append(result)
+        if on_result:
+            on_result(len(results), len(tasks))
+    return results
+
+def _key(result):
+    return tuple(result["order"]), tuple(result["seasonal_order"])
+
+def search_orders(energy, exog, candidates=SEARCH_CANDIDATES, maxiter=50, budget_seconds=SEARCH_BUDGET_SECONDS,
+                  workers=SEARCH_WORKERS, warm_start=None, progress=None):
+    """Pick the SARIMAX order with the lowest AIC, fitting candidates in parallel processes.
+
+    Every candidate first gets a short screening fit; those within
+    SEARCH_AIC_MARGIN of the best are then fitted fully from their
+    screening parameters. `warm_start` maps (order, seasonal_order) to
+    starting parameters, e.g. those of the previous best model. Returns
+    (best, leaderboard): the winning result with its parameters, and every
+    candidate's scores and fit times sorted by AIC.
+    """
+    warm_start = warm_start or {}
+    deadline = time.monotonic() + budget_seconds
+    candidates = [(tuple(order), tuple(seasonal_order)) for order, seasonal_order in candidates]
+
+    def report(low, high):
+        return lambda done, total: progress(low + int((high - low) * done / total)) if progress else None
+
+    # The pool is terminated on exit, which also stops fits still running past the budget
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(max(min(workers, len(candidates)), 1), initializer=_init_worker, initargs=(energy, exog)) as pool:
+        screened = _run_phase(
+            pool,
+            [(order, seasonal_order, SEARCH_SCREEN_MAXITER, warm_start.get((order, seasonal_order))) for order, seasonal_order in candidates],
+            deadline,
+            report(0, 50)
+        )
+
+        fitted = sorted((result for result in screened if result["status"] == "fitted"), key=lambda result: result["aic"])
+        if not fitted:
+            raise ValueError("No SARIMAX candidate could be fitted within the search budget.")
+
+        # Early stop: clearly worse candidates never get a full fit
+        finalists = [result for result in fitted if result["aic"] <= fitted[0]["aic"] + SEARCH_AIC_MARGIN][:SEARCH_FINALISTS]
+        for result in fitted:
+            if result not in finalists:
+                result["status"] = "pruned"
+
+        final = _run_phase(
+            pool,
+            [(*_key(result), maxiter, result["params"]) for result in finalists],
+            deadline,
+            report(50, 100)
+        )
+
+    leaderboard = {_key(result): result for result in screened}
+    for screen, result in zip(finalists, final):
+        if result["status"] == "fitted":
+            result["fit_seconds"] = round(screen["fit_seconds"] + result["fit_seconds"], 3)
+            leaderboard[_key(result)] = result
+        else:
+            screen["status"] = f"screened ({result['status']})"  # Keep the screening fit
+
+    ranked = sorted(leaderboard.values(), key=lambda result: result.get("aic", float("inf")))
+    best = next(result for result in ranked if "params" in result and result["status"] != "pruned")
+    return best, [{key: value for key, value in result.items() if key != "params"} for result in ranked]
@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# werkzeug method string of new hashes, e.g. "scrypt:32768:8:1"; unset uses werkzeug's default.
+# Only when it is set are stored hashes made with other parameters upgraded on the user's next login.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD") or None
+# Threads hashing at once (hashlib releases the GIL, so this bounds the CPU used),
+# and hash requests allowed to wait behind them before new ones are refused
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 16))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_admission = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE)
+_stats_lock = threading.Lock()
+_stats = {"hashes": 0, "verifications": 0, "rehashes": 0, "rejected": 0, "in_flight": 0, "peak_in_flight": 0}
+_latency = {"hash": [0, 0.0, 0.0], "verify": [0, 0.0, 0.0]}  # operation -> [count, total seconds, max seconds]
+_method_prefix = None
+
+class HashQueueFull(Exception):
+    """Raised when the hashing queue cannot take another request."""
+
+def _run(operation, function, *args):
+    """Run a hash operation on the hashing threads, refusing it at once when the queue is full."""
+    if not _admission.acquire(blocking=False):
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise HashQueueFull()
+
+    with _stats_lock:
+        _stats["in_flight"] += 1
+        _stats["peak_in_flight"] = max(_stats["peak_in_flight"], _stats["in_flight"])
+    started = time.monotonic()
+    try:
+        return _executor.submit(function, *args).result()
+    finally:
+        seconds = time.monotonic() - started
+        _admission.release()
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+            latency = _latency[operation]
+            latency[0] += 1
+            latency[1] += seconds
+            latency[2] = max(latency[2], seconds)
+
+def hash_password(password):
+    """Hash a password with PASSWORD_HASH_METHOD (werkzeug's default if unset); raises HashQueueFull when overloaded."""
+    if PASSWORD_HASH_METHOD is None:
+        hashed = _run("hash", generate_password_hash, password)
+    else:
+        hashed = _run("hash", generate_password_hash, password, PASSWORD_HASH_METHOD)
+    with _stats_lock:
+        _stats["hashes"] += 1
+    return hashed
+
+def verify_password(password_hash, password):
+    """Check a password against its stored hash; raises HashQueueFull when overloaded."""
+    valid = _run("verify", check_password_hash, password_hash, password)
+    with _stats_lock:
+        _stats["verifications"] += 1
+    return valid
+
+def _current_prefix():
+    # werkzeug fills in default parameters ("pbkdf2" -> "pbkdf2:sha256:600000"), so compare with a real hash
+    global _method_prefix
+    if _method_prefix is None:
+        _method_prefix = generate_password_hash("", PASSWORD_HASH_METHOD).split("$", 1)[0]
+    return _method_prefix
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with other parameters than a configured PASSWORD_HASH_METHOD."""
+    if PASSWORD_HASH_METHOD is None:
+        return False
+    return password_hash.split("$", 1)[0] != _current_prefix()
+
+def rehash_if_needed(password_hash, password):
+    """Return a new hash of a verified password if its stored one is outdated, else None.
+
+    Skipped (None) when the hashing queue is full; the next login retries.
+    """
+    if not needs_rehash(password_hash):
+        return None
+    try:
+        hashed = hash_password(password)
+    except HashQueueFull:
+        return None
+    with _stats_lock:
+        _stats["rehashes"] += 1
+    return hashed
+
+def get_hasher_stats():
+    with _stats_lock:
+        return {
+            **_stats,
+            "method": PASSWORD_HASH_METHOD,
+            "workers": PASSWORD_HASH_WORKERS,
+            "max_queue": PASSWORD_HASH_MAX_QUEUE,
+            "queued": max(_stats["in_flight"] - PASSWORD_HASH_WORKERS, 0),
+            "latency": {
+                operation: {
+                    "count": count,
+                    "avg_ms": round(total / count * 1000, 2) if count else 0,
+                    "max_ms": round(maximum * 1000, 2),
+                }
+                for operation, (count, total, maximum) in _latency.items()
+            },
+        }
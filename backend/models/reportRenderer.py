@@ -0,0 +1,105 @@
+import io
+import os
+import glob
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+def _chart(draw, width=6.5, height=2.6):
+    """Render a matplotlib chart once into a PNG flowable."""
+    fig, ax = plt.subplots(figsize=(width, height), dpi=120)
+    draw(ax)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    buffer.seek(0)
+    return Image(buffer, width=width * inch, height=height * inch)
+
+def _table(rows, col_widths=None):
+    table = Table(rows, colWidths=col_widths, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2E7D32")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#F1F8E9")]),
+    ]))
+    return table
+
+def _page_number(canvas, doc):
+    canvas.setFont("Helvetica", 8)
+    canvas.drawRightString(letter[0] - 0.75 * inch, 0.5 * inch, f"Page {doc.page}")
+
+def render_report_pdf(path, report):
+    """Worker entry point: build the PDF for pre-aggregated report data and write it to `path`."""
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph("EnerGauge Forecast Report", styles["Title"]),
+        Paragraph(f"User ID: {report['user_id']} &nbsp;&nbsp; Generated: {report['generated_at']}", styles["Normal"]),
+        Spacer(1, 12),
+    ]
+
+    totals = report["totals"]
+    story.append(_table([
+        ["Forecasts", "Total Energy", "Total Savings", "Avg Peak Load", "Max Peak Load"],
+        [totals["forecasts"], totals["total_energy"], totals["total_savings"], totals["avg_peak_load"], totals["max_peak_load"]],
+    ]))
+    story.append(Spacer(1, 12))
+
+    daily = report["daily"]
+    if daily:
+        def draw_daily(ax):
+            days = [day for day, _, _, _ in daily]
+            ax.plot(days, [energy for _, energy, _, _ in daily], label="Forecast energy", color="#2E7D32")
+            ax.plot(days, [savings for _, _, savings, _ in daily], label="Energy savings", color="#F9A825")
+            ax.set_title("Forecasted energy by day")
+            ax.legend(fontsize=7)
+            step = max(len(days) // 8, 1)
+            ax.set_xticks(range(0, len(days), step))
+            ax.set_xticklabels(days[::step], rotation=30, fontsize=7)
+        story.append(_chart(draw_daily))
+
+    def draw_weekdays(ax):
+        ax.bar(WEEKDAYS, report["weekday_energy"], color="#66BB6A")
+        ax.set_title("Average forecasted energy by weekday")
+    story.append(_chart(draw_weekdays))
+
+    def draw_factors(ax):
+        factors = report["avg_factors"]
+        ax.barh(list(factors), list(factors.values()), color="#43A047")
+        ax.set_title("Average feature contribution")
+        ax.tick_params(labelsize=7)
+    story.append(_chart(draw_factors, height=2.8))
+
+    if report["recent"]:
+        story.append(PageBreak())
+        story.append(Paragraph(f"Most recent forecasts (up to {len(report['recent'])})", styles["Heading2"]))
+        # Long tables split across pages with the header row repeated
+        story.append(_table(
+            [["Created", "Forecast Energy", "Energy Savings", "Peak Load"]] + [list(row) for row in report["recent"]],
+            col_widths=[2 * inch, 1.5 * inch, 1.5 * inch, 1.5 * inch]
+        ))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    SimpleDocTemplate(tmp_path, pagesize=letter, title="Forecast Data").build(story, onFirstPage=_page_number, onLaterPages=_page_number)
+    os.replace(tmp_path, path)
+
+    # Reports for older forecast states are no longer needed
+    user_prefix = os.path.join(os.path.dirname(path), f"{report['user_id']}-")
+    for old_path in glob.glob(f"{user_prefix}*.pdf"):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass  # Already removed by another build
+    return path
@@ -0,0 +1,154 @@
+import numpy as np
+
+# Steps and tolerance of the check against statsmodels run before a predictor is used
+PREDICTOR_CHECK_STEPS = 48
+PREDICTOR_CHECK_RTOL = 1e-6
+PREDICTOR_CHECK_ATOL = 1e-8
+
+class StateSpacePredictor:
+    """Mean predictions of a fitted SARIMAX model with NumPy only.
+
+    Holds the time-invariant state-space matrices, the exog coefficients, the
+    predicted state after the last training row and the in-sample one-step
+    predictions, i.e. everything SARIMAXResults.forecast(steps, exog) and
+    predict(start, end, exog) use for the mean:
+
+        y[t] = design @ state[t] + exog[t] @ exog_coefficients
+        state[t + 1] = transition @ state[t] + state_intercept
+    """
+
+    ARRAYS = ("design", "transition", "state_intercept", "exog_coefficients", "state", "fitted")
+
+    def __init__(self, design, transition, state_intercept, exog_coefficients, state, fitted):
+        self.design = np.asarray(design, dtype=np.float64)
+        self.transition = np.asarray(transition, dtype=np.float64)
+        self.state_intercept = np.asarray(state_intercept, dtype=np.float64)
+        self.exog_coefficients = np.asarray(exog_coefficients, dtype=np.float64)
+        self.state = np.asarray(state, dtype=np.float64)
+        self.fitted = np.asarray(fitted, dtype=np.float64)
+
+    @classmethod
+    def from_results(cls, results):
+        """Export the forecaster of fitted SARIMAX results; raises ValueError for unsupported specifications."""
+        model = results.model
+        if model.k_endog != 1 or model.k_trend or model.simple_differencing or model.time_varying_regression or not model.mle_regression:
+            raise ValueError("Only univariate SARIMAX models without trend, simple differencing or state-space regression can be exported.")
+
+        # Bind the fitted parameters; time-invariant matrices come back without their time axis
+        model.update(results.params)
+        ssm = model.ssm
+        for name, ndim in (("design", 2), ("transition", 2), ("state_intercept", 1)):
+            if ssm[name].ndim != ndim:
+                raise ValueError(f"Time-varying {name} matrices can't be exported.")
+
+        params = np.asarray(results.params, dtype=np.float64)
+        return cls(
+            design=np.array(ssm["design"][0]),
+            transition=np.array(ssm["transition"]),
+            state_intercept=np.array(ssm["state_intercept"]),
+            exog_coefficients=params[model.k_trend:model.k_trend + model.k_exog],
+            state=np.array(results.filter_results.predicted_state[:, -1]),
+            fitted=np.asarray(results.fittedvalues, dtype=np.float64),
+        )
+
+    @property
+    def nobs(self):
+        return len(self.fitted)
+
+    def _state_path(self, steps):
+        """design @ state of the `steps` rows after the training data, i.e. the forecast without exog."""
+        path = np.empty(steps)
+        state = self.state.copy()
+        for step in range(steps):
+            path[step] = self.design @ state
+            state = self.transition @ state + self.state_intercept
+        return path
+
+    def forecast(self, steps, exog=None):
+        """Return the mean forecast of the `steps` rows after the training data."""
+        if self.exog_coefficients.size:
+            intercepts = np.asarray(exog, dtype=np.float64).reshape(steps, -1) @ self.exog_coefficients
+        else:
+            intercepts = np.zeros(steps)
+        return self._state_path(steps) + intercepts
+
+    def predict(self, start, end, exog=None):
+        """Return the mean prediction of rows `start` to `end` (inclusive), like SARIMAXResults.predict.
+
+        Training rows get their one-step predictions; `exog` holds the
+        features of the rows after the training data and is ignored when
+        there are none.
+        """
+        in_sample = self.fitted[start:min(end + 1, self.nobs)]
+        if end < self.nobs:
+            return in_sample.copy()
+
+        steps = end - self.nobs + 1
+        if self.exog_coefficients.size and np.shape(exog) != (steps, self.exog_coefficients.size):
+            raise ValueError(
+                "Provided exogenous values are not of the appropriate shape. "
+                f"Required {(steps, self.exog_coefficients.size)}, got {np.shape(exog)}."
+            )
+        return np.concatenate([in_sample, self.forecast(steps, exog)[max(start - self.nobs, 0):]])
+
+    def predict_scenarios(self, counts, exog=None):
+        """Stacked predict(count, 2 * count - 1, rows) of scenarios with `counts` rows each.
+
+        `exog` stacks the scenarios' rows in order. The state path after the
+        training data doesn't depend on exog, so it is computed once for all
+        scenarios, and the exog term is one product over every row.
+        """
+        counts = np.asarray(counts)
+        starts = np.cumsum(counts) - counts
+        steps = np.maximum(2 * counts - self.nobs, 0)  # Rows of each scenario after the training data
+        k_exog = self.exog_coefficients.size
+        for count, step in zip(counts, steps):
+            if k_exog and step and step != count:
+                raise ValueError(
+                    "Provided exogenous values are not of the appropriate shape. "
+                    f"Required {(int(step), k_exog)}, got {(int(count), k_exog)}."
+                )
+
+        path = self._state_path(int(steps.max()) if len(steps) else 0)
+        intercepts = np.asarray(exog, dtype=np.float64).reshape(-1, k_exog) @ self.exog_coefficients if k_exog and steps.any() else None
+
+        predictions = []
+        for start, count, step in zip(starts, counts, steps):
+            predictions.append(self.fitted[count:min(2 * count, self.nobs)])
+            if step:
+                future = path[:step] if intercepts is None else path[:step] + intercepts[start:start + count]
+                predictions.append(future[max(count - self.nobs, 0):])
+        return np.concatenate(predictions) if predictions else np.empty(0)
+
+    def check_against(self, results, exog, steps=PREDICTOR_CHECK_STEPS):
+        """Compare with statsmodels' forecast for `exog` and its predictions of the last training rows.
+
+        Returns the largest absolute difference.
+        """
+        steps = min(steps, len(exog)) if exog is not None else steps
+        exog = None if exog is None else np.asarray(exog, dtype=np.float64)[:steps]
+        start = max(self.nobs - steps, 0)
+        expected = np.concatenate([
+            np.asarray(results.forecast(steps=steps, exog=exog), dtype=np.float64),
+            np.asarray(results.predict(start=start, end=self.nobs + steps - 1, exog=exog), dtype=np.float64),
+        ])
+        actual = np.concatenate([self.forecast(steps, exog), self.predict(start, self.nobs + steps - 1, exog)])
+        if not np.allclose(actual, expected, rtol=PREDICTOR_CHECK_RTOL, atol=PREDICTOR_CHECK_ATOL):
+            raise ValueError(f"Exported predictor differs from statsmodels by up to {np.max(np.abs(actual - expected)):.3g}.")
+        return float(np.max(np.abs(actual - expected))) if steps else 0.0
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved predictor; raises ValueError for files exported without in-sample predictions."""
+        with np.load(path) as arrays:
+            if "fitted" not in arrays.files:
+                raise ValueError("Predictor was exported without in-sample predictions; export it again.")
+            return cls(**{name: arrays[name] for name in cls.ARRAYS})
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+
+REQUIRED_COLUMNS = [
+    "Timestamp", "Temperature", "Humidity", "SquareFootage", "Occupancy",
+    "HVACUsage", "LightingUsage", "RenewableEnergy", "DayOfWeek",
+    "Holiday", "EnergyConsumption"
+]
+
+# Rows read from the upload at a time
+TRAINING_CSV_CHUNK_ROWS = int(os.getenv("TRAINING_CSV_CHUNK_ROWS", 100000))
+
+# Measurements are read as float32; categorical columns use the encoder's dtypes
+NUMERIC_DTYPES = {
+    "Temperature": "float32",
+    "Humidity": "float32",
+    "SquareFootage": "float32",
+    "Occupancy": "float32",
+    "RenewableEnergy": "float32",
+    "EnergyConsumption": "float32",
+}
+
+def load_training_data(csv_path, encoder, chunksize=TRAINING_CSV_CHUNK_ROWS, scalers=None):
+    """Stream a training CSV in chunks and return data ready for SARIMAX.
+
+    Features are encoded with `encoder` (a FeatureEncoder). Returns
+    (energy, features, energy_scaler, feature_scaler): the scaled target as a
+    Series and the scaled features as a DataFrame, both indexed by sorted
+    timestamps, plus the fitted scalers. Pass `scalers` as
+    (energy_scaler, feature_scaler) to scale new observations like an
+    existing model's data instead of fitting new ranges.
+    """
+    # Loaded here so serving processes that only need REQUIRED_COLUMNS skip them
+    import pandas as pd
+    from sklearn.preprocessing import MinMaxScaler
+
+    reader = pd.read_csv(
+        csv_path,
+        chunksize=chunksize,
+        usecols=lambda col: col in REQUIRED_COLUMNS,
+        dtype={**NUMERIC_DTYPES, **encoder.csv_dtypes()},
+        parse_dates=["Timestamp"]
+    )
+
+    energy_scaler, feature_scaler = scalers if scalers is not None else (MinMaxScaler(), MinMaxScaler())
+    feature_chunks, target_chunks, timestamp_chunks = [], [], []
+
+    with reader:
+        for chunk_number, chunk in enumerate(reader):
+            if chunk_number == 0 and not all(col in chunk.columns for col in REQUIRED_COLUMNS):
+                raise ValueError("CSV must contain required energy forecasting columns")
+
+            features = encoder.encode_frame(chunk, dtype=np.float32)
+            target = chunk["EnergyConsumption"].to_numpy(dtype=np.float32)
+            timestamps = chunk["Timestamp"].to_numpy(dtype="datetime64[ns]")
+            del chunk
+
+            # Scaler ranges are built up chunk by chunk
+            if scalers is None:
+                feature_scaler.partial_fit(features)
+                energy_scaler.partial_fit(target.reshape(-1, 1))
+
+            feature_chunks.append(features)
+            target_chunks.append(target)
+            timestamp_chunks.append(timestamps)
+
+    if not feature_chunks:
+        raise ValueError("CSV contains no rows")
+
+    # Build the final float64 arrays once, directly from the compact chunks
+    features = np.concatenate(feature_chunks, dtype=np.float64)
+    del feature_chunks
+    target = np.concatenate(target_chunks, dtype=np.float64)
+    del target_chunks
+    timestamps = np.concatenate(timestamp_chunks)
+    del timestamp_chunks
+
+    # Sort by date, skipping the reorder when the export is already in order
+    if np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind="stable")
+        features = features[order]
+        target = target[order]
+        timestamps = timestamps[order]
+
+    # Scale in place instead of allocating transformed copies
+    features *= feature_scaler.scale_
+    features += feature_scaler.min_
+    target *= energy_scaler.scale_[0]
+    target += energy_scaler.min_[0]
+
+    index = pd.DatetimeIndex(timestamps, name="Timestamp")
+    energy = pd.Series(target, index=index, name="EnergyConsumption", copy=False)
+    exog = pd.DataFrame(features, index=index, columns=encoder.columns, copy=False)
+    return energy, exog, energy_scaler, feature_scaler
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import uuid
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from models.forecastModel import train_sarimax_model, update_sarimax_model, search_sarimax_model, backtest_saved_model
+
+JOBS_DIR = "models/trainedDataForecast/jobs"
+UPLOADS_DIR = "models/trainedDataForecast/uploads"
+
+# "full" fits a new model on the whole history, "search" also picks its orders,
+# "append" extends the saved model with new rows
+TRAINING_MODES = ("full", "search", "append")
+# Jobs can also backtest the saved model on an uploaded CSV
+JOB_MODES = TRAINING_MODES + ("backtest",)
+JOB_FUNCTIONS = {
+    "full": train_sarimax_model,
+    "search": search_sarimax_model,
+    "append": update_sarimax_model,
+    "backtest": backtest_saved_model,
+}
+
+# Maximum number of SARIMAX fits running at once on this host, across all web
+# processes, and jobs each process allows to wait behind them
+TRAINING_MAX_CONCURRENT_FITS = int(os.getenv("TRAINING_MAX_CONCURRENT_FITS", 1))
+TRAINING_MAX_QUEUED_JOBS = int(os.getenv("TRAINING_MAX_QUEUED_JOBS", 10))
+# How often (seconds) a waiting job checks for a free fit slot
+TRAINING_SLOT_POLL_SECONDS = float(os.getenv("TRAINING_SLOT_POLL_SECONDS", 2))
+
+_executor = None
+_executor_lock = threading.Lock()
+_active_jobs = set()  # Job ids submitted by this process and not finished yet
+
+class TrainingQueueFull(Exception):
+    """Raised when the training queue cannot take another job."""
+
+def _job_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+def _read_job(job_id):
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _write_job(job):
+    """Atomically write a job status file."""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    tmp_path = f"{_job_path(job['job_id'])}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, _job_path(job["job_id"]))
+
+def _update_job(job_id, **fields):
+    job = _read_job(job_id) or {"job_id": job_id}
+    job.update(fields)
+    _write_job(job)
+    return job
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers keep fits out of the web process and its GIL
+            _executor = ProcessPoolExecutor(
+                max_workers=TRAINING_MAX_CONCURRENT_FITS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+def _try_lock(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+@contextmanager
+def _fit_slot():
+    """Hold one of TRAINING_MAX_CONCURRENT_FITS slot lock files in JOBS_DIR, waiting for a free one.
+
+    Every web process's workers share the files, and the OS releases a lock
+    when its process exits, so a crashed worker never keeps a slot.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    while True:
+        for slot in range(TRAINING_MAX_CONCURRENT_FITS):
+            f = open(os.path.join(JOBS_DIR, f"slot-{slot}.lock"), "w")
+            if _try_lock(f):
+                try:
+                    yield slot
+                finally:
+                    f.close()  # Releases the lock
+                return
+            f.close()
+        time.sleep(TRAINING_SLOT_POLL_SECONDS)
+
+def _run_training_job(job_id, csv_path, mode="full", options=None):
+    """Worker process entry point: run one training job and record its outcome."""
+    options = options or {}
+
+    def progress(stage, percent):
+        _update_job(job_id, stage=stage, progress=percent)
+
+    try:
+        _update_job(job_id, stage="waiting")
+        with _fit_slot():
+            _update_job(job_id, status="running", stage="starting", progress=0, started_at=time.time())
+            metrics = JOB_FUNCTIONS[mode](csv_path, progress=progress, **options)
+        _update_job(job_id, status="completed", stage="done", progress=100, finished_at=time.time(), metrics=metrics)
+    except Exception as e:
+        _update_job(job_id, status="failed", finished_at=time.time(), error=str(e))
+    finally:
+        if os.path.exists(csv_path):
+            os.remove(csv_path)
+
+def _on_job_done(job_id, future):
+    global _executor
+    # exception() raises CancelledError for a cancelled future
+    error = None if future.cancelled() else future.exception()
+    with _executor_lock:
+        _active_jobs.discard(job_id)
+        # A worker died hard; start a fresh pool for the next submission
+        if isinstance(error, BrokenProcessPool):
+            _executor = None
+
+    # The worker records its own result; this only catches jobs that never ran or crashed workers
+    if future.cancelled():
+        _update_job(job_id, status="cancelled", finished_at=time.time())
+    elif error is not None:
+        _update_job(job_id, status="failed", finished_at=time.time(), error=f"Training worker crashed: {error}")
+
+def save_upload(file):
+    """Save an uploaded CSV where a worker process can read it and return its path."""
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    csv_path = os.path.join(UPLOADS_DIR, f"{uuid.uuid4().hex}.csv")
+    file.save(csv_path)
+    return csv_path
+
+def submit_training_job(csv_path, submitted_by=None, mode="full", options=None):
+    """Queue a training job for an uploaded CSV and return its job record.
+
+    `options` are passed to the mode's function, e.g. model_key, or refit for "append".
+    """
+    if mode not in JOB_MODES:
+        raise ValueError(f"Unknown training mode: {mode}")
+    options = options or {}
+
+    job_id = uuid.uuid4().hex
+    with _executor_lock:
+        if len(_active_jobs) >= TRAINING_MAX_CONCURRENT_FITS + TRAINING_MAX_QUEUED_JOBS:
+            raise TrainingQueueFull("Training queue is full. Try again later.")
+        _active_jobs.add(job_id)
+
+    job = _update_job(
+        job_id,
+        status="queued",
+        stage="queued",
+        progress=0,
+        submitted_by=submitted_by,
+        mode=mode,
+        options=options,
+        created_at=time.time()
+    )
+
+    try:
+        future = _get_executor().submit(_run_training_job, job_id, csv_path, mode, options)
+    except Exception:
+        with _executor_lock:
+            _active_jobs.discard(job_id)
+        raise
+    future.add_done_callback(lambda f: _on_job_done(job_id, f))
+    return job
+
+def _with_elapsed(job):
+    """Add the elapsed seconds of a job to its record."""
+    started_at = job.get("started_at")
+    if started_at:
+        job["elapsed_seconds"] = round((job.get("finished_at") or time.time()) - started_at, 3)
+    else:
+        job["elapsed_seconds"] = 0
+    return job
+
+def get_training_job(job_id):
+    """Return the status of a training job, or None if it doesn't exist."""
+    job = _read_job(job_id)
+    return _with_elapsed(job) if job else None
+
+def list_training_jobs(limit=20):
+    """Return the most recent training jobs, newest first."""
+    if not os.path.isdir(JOBS_DIR):
+        return []
+
+    jobs = []
+    for name in os.listdir(JOBS_DIR):
+        if name.endswith(".json"):
+            job = _read_job(name[:-len(".json")])
+            if job:
+                jobs.append(_with_elapsed(job))
+
+    jobs.sort(key=lambda job: job.get("created_at", 0), reverse=True)
+    return jobs[:limit]
@@ -1,6 +1,7 @@
 from datetime import datetime 
 import re
-from werkzeug.security import generate_password_hash
+from models.passwordHasher import hash_password
+from config.db import mongo
 
 def is_valid_email(email):
     """Validate email format using regex."""
@@ -12,6 +13,22 @@ def is_valid_phone(phone):
     pattern = r"^\+?[0-9]\d{1,14}$"  # E.164 format (max 15 digits, optional +)
     return bool(re.match(pattern, phone))
 
+# Fields never returned by the API
+HIDDEN_FIELDS_PROJECTION = {"password": 0, "search_keys": 0}
+
+# search_keys holds lowercase email, first name, last name and full name, so an
+# anchored prefix regex on it is served by the search_keys index
+SEARCH_KEYS_EXPRESSION = [
+    {"$toLower": "$email"},
+    {"$toLower": "$first_name"},
+    {"$toLower": "$last_name"},
+    {"$toLower": {"$concat": [{"$ifNull": ["$first_name", ""]}, " ", {"$ifNull": ["$last_name", ""]}]}},
+]
+
+def user_search_keys(first_name, last_name, email):
+    """Python counterpart of SEARCH_KEYS_EXPRESSION, for new users."""
+    return [email.lower(), first_name.lower(), last_name.lower(), f"{first_name} {last_name}".lower()]
+
 def get_user_schema(first_name, last_name, email, password, phone="", address="", city="", country="", role="user", is_verified=False):
     """Creates a user dictionary with validation and security improvements."""
     
@@ -21,7 +38,8 @@ def get_user_schema(first_name, last_name, email, password, phone="", address=""
     if phone and not is_valid_phone(phone):
         raise ValueError("Invalid phone number format")
 
-    hashed_password = generate_password_hash(password)
+    # Hashed on the bounded hashing threads; raises HashQueueFull when they're overloaded
+    hashed_password = hash_password(password)
 
     return {
         "first_name": first_name,
@@ -35,4 +53,10 @@ def get_user_schema(first_name, last_name, email, password, phone="", address=""
         "role": role,  # Default role
         "is_verified": is_verified,  # Email verification status
         "created_at": datetime.now(),
+        "search_keys": user_search_keys(first_name, last_name, email),
     }
+
+def backfill_user_search_keys():
+    """Set search_keys on users created before it existed; returns the number updated."""
+    result = mongo.db.users.update_many({"search_keys": {"$exists": False}}, [{"$set": {"search_keys": SEARCH_KEYS_EXPRESSION}}])
+    return result.modified_count
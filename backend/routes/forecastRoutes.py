@@ -1,11 +1,19 @@
 from flask import Blueprint
-from controllers.forecastController import train_sarimax, predict_forecast, get_forecast_trends,  get_user_forecast, download_forecast_csv, download_forecast_pdf
+from controllers.forecastController import train_sarimax, backtest_sarimax, get_training_job_status, get_training_jobs, get_model_versions, get_model_keys, rollback_model_version, predict_forecast, predict_forecast_batch, get_forecast_cache_stats, get_forecast_trends,  get_user_forecast, download_forecast_csv, download_forecast_pdf
 
 
 forecast_bp = Blueprint("forecast", __name__)
 
 forecast_bp.route('/train_arima', methods=['POST'])(train_sarimax)
+forecast_bp.route('/train_arima/backtest', methods=['POST'])(backtest_sarimax)
+forecast_bp.route('/train_arima/jobs', methods=['GET'])(get_training_jobs)
+forecast_bp.route('/train_arima/jobs/<job_id>', methods=['GET'])(get_training_job_status)
+forecast_bp.route('/train_arima/models', methods=['GET'])(get_model_versions)
+forecast_bp.route('/train_arima/models/keys', methods=['GET'])(get_model_keys)
+forecast_bp.route('/train_arima/models/rollback', methods=['POST'])(rollback_model_version)
 forecast_bp.route('/predict_forecast', methods=['POST'])(predict_forecast)
+forecast_bp.route('/predict_forecast/batch', methods=['POST'])(predict_forecast_batch)
+forecast_bp.route('/predict_forecast/cache', methods=['GET'])(get_forecast_cache_stats)
 forecast_bp.route('/trends', methods=['GET'])(get_forecast_trends)
 forecast_bp.route('/userforecast', methods=['GET'])(get_user_forecast)
 
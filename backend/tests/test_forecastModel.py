@@ -0,0 +1,63 @@
+"""Appending observations to a model saved in the registry."""
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+from models import forecastModel, modelRegistry
+
+# statsmodels warns about inferred frequencies and short fits
+pytestmark = pytest.mark.filterwarnings("ignore")
+
+START = pd.Timestamp("2024-01-01")
+
+def _write_csv(path, start, rows):
+    rng = np.random.default_rng(rows)
+    timestamps = pd.date_range(start, periods=rows, freq="h")
+    pd.DataFrame({
+        "Timestamp": timestamps,
+        "Temperature": rng.uniform(10, 30, rows),
+        "Humidity": rng.uniform(30, 60, rows),
+        "SquareFootage": 1500.0,
+        "Occupancy": rng.integers(0, 10, rows).astype(float),
+        "HVACUsage": "On",
+        "LightingUsage": "Off",
+        "RenewableEnergy": rng.uniform(0, 5, rows),
+        "DayOfWeek": timestamps.day_name(),
+        "Holiday": "No",
+        "EnergyConsumption": rng.uniform(50, 90, rows),
+    }).to_csv(path, index=False)
+    return str(path)
+
+@pytest.fixture
+def trained(tmp_path, monkeypatch):
+    # A small model keeps the test fast; the registry round trip is the same
+    monkeypatch.setattr(modelRegistry, "REGISTRY_DIR", str(tmp_path / "registry"))
+    monkeypatch.setattr(forecastModel, "SARIMAX_ORDER", (1, 0, 0))
+    monkeypatch.setattr(forecastModel, "SARIMAX_SEASONAL_ORDER", (0, 0, 0, 0))
+    monkeypatch.setattr(forecastModel, "SARIMAX_MAXITER", 5)
+    forecastModel.train_sarimax_model(_write_csv(tmp_path / "history.csv", START, 400))
+    return tmp_path
+
+def test_append_contiguous_rows(trained):
+    result = forecastModel.update_sarimax_model(_write_csv(trained / "new.csv", START + pd.Timedelta(hours=400), 48))
+    assert result["mode"] == "append"
+    assert result["nobs"] == 448
+
+    # The saved version keeps its dates, so the next append is checked too
+    model = forecastModel.load_model()[0]
+    assert model.model._index[-1] == START + pd.Timedelta(hours=447)
+    result = forecastModel.update_sarimax_model(_write_csv(trained / "more.csv", START + pd.Timedelta(hours=448), 24), refit=True)
+    assert result["mode"] == "refit"
+    assert result["nobs"] == 472
+
+def test_append_rejects_a_gap(trained):
+    version = modelRegistry.current_version()
+    with pytest.raises(ValueError, match="without gaps"):
+        forecastModel.update_sarimax_model(_write_csv(trained / "gap.csv", START + pd.Timedelta(hours=410), 48))
+    assert modelRegistry.current_version() == version
+
+def test_trained_results_can_be_pickled(trained, monkeypatch):
+    saved = []
+    monkeypatch.setattr(forecastModel, "save_model", lambda model, *args, **kwargs: saved.append(model))
+    forecastModel.train_sarimax_model(_write_csv(trained / "history.csv", START, 400), progress=lambda stage, percent: None)
+    pickle.dumps(saved[0])
@@ -0,0 +1,133 @@
+"""Mail outbox lease, send, retry and give-up against Flask-Mail with sending suppressed."""
+import datetime
+import smtplib
+from types import SimpleNamespace
+import mongomock
+import pytest
+from flask import Flask
+from flask_mail import Connection, Mail
+from models import mailQueueModel
+
+@pytest.fixture
+def outbox(monkeypatch):
+    """The mail_outbox collection of an in-memory database."""
+    db = mongomock.MongoClient().db
+    monkeypatch.setattr(mailQueueModel, "mongo", SimpleNamespace(db=db))
+    return db.mail_outbox
+
+@pytest.fixture
+def app(monkeypatch):
+    app = Flask(__name__)
+    app.config.update(MAIL_SUPPRESS_SEND=True, MAIL_DEFAULT_SENDER="noreply@example.com")
+    mail = Mail(app)
+    monkeypatch.setattr(mailQueueModel, "_mail", mail)
+    return app
+
+@pytest.fixture
+def failing_send(monkeypatch):
+    """Make the SMTP connection refuse messages to the given recipients."""
+    refused = set()
+    send = Connection.send
+
+    def refusing_send(self, message, envelope_from=None):
+        if refused.intersection(message.recipients):
+            raise smtplib.SMTPRecipientsRefused({r: (550, b"no") for r in message.recipients})
+        return send(self, message, envelope_from)
+
+    monkeypatch.setattr(Connection, "send", refusing_send)
+    return refused
+
+def _expire(outbox, message_id, field):
+    outbox.update_one({"_id": message_id}, {"$set": {field: datetime.datetime.now() - datetime.timedelta(seconds=1)}})
+
+def test_lease_and_send(app, outbox):
+    first = mailQueueModel.enqueue_mail(["a@example.com"], "Verify", "<p>a</p>")
+    second = mailQueueModel.enqueue_mail(["b@example.com"], "Verify", "<p>b</p>")
+
+    batch = mailQueueModel._claim_batch()
+    assert [message["_id"] for message in batch] == [first, second]
+    assert all(message["status"] == "sending" and message["attempts"] == 1 for message in batch)
+    assert all(message["locked_until"] > datetime.datetime.now() for message in batch)
+    assert mailQueueModel._claim_batch() == []  # Leased messages aren't claimed twice
+
+    with app.extensions["mail"].record_messages() as sent:
+        mailQueueModel._send_batch(app, batch)
+
+    assert sorted(message.recipients[0] for message in sent) == ["a@example.com", "b@example.com"]
+    assert sent[0].sender == "noreply@example.com"
+    for document in outbox.find():
+        assert document["status"] == "sent"
+        assert document["attempts"] == 1
+        assert "locked_until" not in document
+
+def test_failed_message_is_retried_later(app, outbox, failing_send):
+    failing_send.add("bad@example.com")
+    bad = mailQueueModel.enqueue_mail(["bad@example.com"], "Verify", "<p>bad</p>")
+    good = mailQueueModel.enqueue_mail(["good@example.com"], "Verify", "<p>good</p>")
+
+    with app.extensions["mail"].record_messages() as sent:
+        mailQueueModel._send_batch(app, mailQueueModel._claim_batch())
+
+    assert [message.recipients for message in sent] == [["good@example.com"]]
+    assert outbox.find_one({"_id": good})["status"] == "sent"
+    failed = outbox.find_one({"_id": bad})
+    assert failed["status"] == "pending"
+    assert failed["attempts"] == 1
+    assert failed["next_attempt_at"] > datetime.datetime.now()
+    assert "last_error" in failed and "locked_until" not in failed
+    assert mailQueueModel._claim_batch() == []  # Backing off
+
+    failing_send.clear()
+    _expire(outbox, bad, "next_attempt_at")
+    batch = mailQueueModel._claim_batch()
+    assert [(message["_id"], message["attempts"]) for message in batch] == [(bad, 2)]
+    mailQueueModel._send_batch(app, batch)
+    assert outbox.find_one({"_id": bad})["status"] == "sent"
+
+def test_gives_up_after_max_attempts(app, outbox, failing_send, monkeypatch):
+    monkeypatch.setattr(mailQueueModel, "MAIL_MAX_ATTEMPTS", 2)
+    failing_send.add("bad@example.com")
+    message_id = mailQueueModel.enqueue_mail(["bad@example.com"], "Verify", "<p>bad</p>")
+
+    mailQueueModel._send_batch(app, mailQueueModel._claim_batch())
+    _expire(outbox, message_id, "next_attempt_at")
+    mailQueueModel._send_batch(app, mailQueueModel._claim_batch())
+
+    document = outbox.find_one({"_id": message_id})
+    assert document["status"] == "failed"
+    assert document["attempts"] == 2
+    _expire(outbox, message_id, "next_attempt_at")
+    assert mailQueueModel._claim_batch() == []
+
+def test_connection_failure_retries_whole_batch(app, outbox, monkeypatch):
+    def refuse_connection():
+        raise smtplib.SMTPConnectError(421, "unavailable")
+
+    monkeypatch.setattr(mailQueueModel._mail, "connect", refuse_connection)
+    mailQueueModel.enqueue_mail(["a@example.com"], "Verify", "<p>a</p>")
+    mailQueueModel.enqueue_mail(["b@example.com"], "Verify", "<p>b</p>")
+
+    mailQueueModel._send_batch(app, mailQueueModel._claim_batch())
+
+    for document in outbox.find():
+        assert document["status"] == "pending"
+        assert document["attempts"] == 1
+        assert "unavailable" in document["last_error"]
+
+def test_expired_lease_is_reclaimed_and_counted(app, outbox, monkeypatch):
+    monkeypatch.setattr(mailQueueModel, "MAIL_MAX_ATTEMPTS", 2)
+    message_id = mailQueueModel.enqueue_mail(["a@example.com"], "Verify", "<p>a</p>")
+
+    # The sender holding the lease never finishes
+    assert len(mailQueueModel._claim_batch()) == 1
+    assert mailQueueModel._claim_batch() == []
+    _expire(outbox, message_id, "locked_until")
+    batch = mailQueueModel._claim_batch()
+    assert [(message["_id"], message["attempts"]) for message in batch] == [(message_id, 2)]
+
+    # Its last allowed lease expires too
+    _expire(outbox, message_id, "locked_until")
+    assert mailQueueModel._claim_batch() == []
+    document = outbox.find_one({"_id": message_id})
+    assert document["status"] == "failed"
+    assert "locked_until" not in document
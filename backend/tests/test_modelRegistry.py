@@ -0,0 +1,31 @@
+"""Publishing versions to the model registry."""
+import os
+import numpy as np
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from models import modelRegistry
+from models.featureEncoder import FeatureEncoder
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(modelRegistry, "REGISTRY_DIR", str(tmp_path))
+    return tmp_path
+
+def _fitted():
+    rng = np.random.default_rng(0)
+    encoder = FeatureEncoder()
+    exog = rng.uniform(size=(100, len(encoder.columns)))
+    energy = np.cumsum(rng.normal(size=100))
+    model = SARIMAX(energy, exog=exog, order=(1, 0, 0))
+    return model.filter(model.start_params), MinMaxScaler().fit(energy.reshape(-1, 1)), MinMaxScaler().fit(exog), encoder
+
+def test_failed_publish_leaves_no_partial_version(registry, monkeypatch):
+    def fail(fitted_model, path):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(modelRegistry, "_export_predictor", fail)
+
+    with pytest.raises(OSError):
+        modelRegistry.publish_version(*_fitted(), key="site")
+    assert os.listdir(registry / "site") == []
+    assert modelRegistry.current_version("site") is None
@@ -0,0 +1,98 @@
+"""The exported NumPy predictor against the statsmodels results it was exported from."""
+import numpy as np
+import pytest
+from sklearn.preprocessing import MinMaxScaler
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from controllers.forecastController import _forecast_scenarios
+from models.featureEncoder import FeatureEncoder
+from models.statePredictor import StateSpacePredictor
+
+NOBS = 240
+RTOL, ATOL = 1e-9, 1e-9
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    exog = rng.uniform(size=(NOBS + 48, 3))
+    energy = np.cumsum(rng.normal(size=NOBS)) + exog[:NOBS] @ [2.0, -1.0, 0.5]
+    return energy, exog
+
+@pytest.fixture(scope="module")
+def results(data):
+    energy, exog = data
+    model = SARIMAX(energy, exog=exog[:NOBS], order=(2, 1, 0), seasonal_order=(1, 0, 0, 24))
+    return model.fit(disp=False, maxiter=25)
+
+@pytest.fixture(scope="module")
+def predictor(results):
+    return StateSpacePredictor.from_results(results)
+
+@pytest.mark.parametrize("steps", [1, 24, 48])
+def test_forecast_matches_statsmodels(results, predictor, data, steps):
+    future = data[1][NOBS:NOBS + steps]
+    np.testing.assert_allclose(predictor.forecast(steps, future), results.forecast(steps=steps, exog=future), rtol=RTOL, atol=ATOL)
+
+@pytest.mark.parametrize("start, end", [(0, 9), (24, 47), (100, 199), (NOBS - 10, NOBS - 1), (NOBS - 10, NOBS + 9), (NOBS, NOBS + 23), (NOBS + 5, NOBS + 20)])
+def test_predict_matches_statsmodels(results, predictor, data, start, end):
+    future = data[1][NOBS:end + 1] if end >= NOBS else None
+    np.testing.assert_allclose(
+        predictor.predict(start, end, future), results.predict(start=start, end=end, exog=future), rtol=RTOL, atol=ATOL
+    )
+
+@pytest.mark.parametrize("count", [1, 24, NOBS // 2, NOBS])
+def test_scenario_prediction_matches_statsmodels(results, predictor, data, count):
+    # predict_forecast's call: rows count to 2 * count - 1, with the scenario's features
+    features = np.resize(data[1][NOBS:], (count, 3))
+    np.testing.assert_allclose(
+        predictor.predict(count, 2 * count - 1, features),
+        results.predict(start=count, end=2 * count - 1, exog=features),
+        rtol=RTOL, atol=ATOL
+    )
+
+@pytest.mark.parametrize("count", [NOBS // 2 + 1, NOBS + 1])
+def test_scenario_prediction_rejects_what_statsmodels_rejects(results, predictor, count):
+    features = np.zeros((count, 3))
+    with pytest.raises(ValueError):
+        results.predict(start=count, end=2 * count - 1, exog=features)
+    with pytest.raises(ValueError):
+        predictor.predict(count, 2 * count - 1, features)
+
+@pytest.mark.parametrize("counts", [[24, 1, 120], [NOBS, 12, NOBS], [5]])
+def test_predict_scenarios_matches_per_scenario_predict(results, predictor, data, counts):
+    features = np.resize(data[1][NOBS:], (sum(counts), 3))
+    starts = np.cumsum(counts) - counts
+    expected = np.concatenate([
+        results.predict(start=count, end=2 * count - 1, exog=features[start:start + count]) for start, count in zip(starts, counts)
+    ])
+    np.testing.assert_allclose(predictor.predict_scenarios(counts, features), expected, rtol=RTOL, atol=ATOL)
+
+def test_predict_scenarios_rejects_what_statsmodels_rejects(predictor):
+    with pytest.raises(ValueError):
+        predictor.predict_scenarios([24, NOBS // 2 + 1], np.zeros((24 + NOBS // 2 + 1, 3)))
+
+def test_check_against_and_round_trip(results, predictor, data, tmp_path):
+    assert predictor.check_against(results, data[1][NOBS - 48:NOBS]) < 1e-8
+
+    path = tmp_path / "predictor.npz"
+    predictor.save(path)
+    loaded = StateSpacePredictor.load(path)
+    np.testing.assert_array_equal(loaded.predict(10, NOBS + 9, data[1][NOBS:NOBS + 10]), predictor.predict(10, NOBS + 9, data[1][NOBS:NOBS + 10]))
+
+def test_export_from_low_memory_results(results, predictor, data):
+    # The registry loads versions with the low-memory filter before exporting them
+    low_memory = results.model.filter(results.params, low_memory=True)
+    exported = StateSpacePredictor.from_results(low_memory)
+    for name in StateSpacePredictor.ARRAYS:
+        np.testing.assert_allclose(getattr(exported, name), getattr(predictor, name), rtol=RTOL, atol=ATOL)
+
+def test_served_forecast_matches_statsmodels(results, predictor, data):
+    encoder = FeatureEncoder(columns=["Temperature", "Occupancy", "RenewableEnergy"], categories={}, scales={})
+    energy_scaler = MinMaxScaler().fit(np.array([[0.0], [500.0]]))
+    feature_scaler = MinMaxScaler().fit(np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]]))
+    scenarios = [
+        (["2025-01-01T00:00:00"] * count, [dict(zip(encoder.columns, row)) for row in data[1][NOBS:NOBS + count]])
+        for count in (12, 48)
+    ]
+    served = _forecast_scenarios(predictor, energy_scaler, feature_scaler, encoder, scenarios)
+    expected = _forecast_scenarios(results, energy_scaler, feature_scaler, encoder, scenarios)
+    assert served == expected
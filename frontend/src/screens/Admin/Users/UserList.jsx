@@ -1,6 +1,6 @@
-import React, { useState, useCallback } from "react";
+import React, { useState, useCallback, useRef } from "react";
 import { View, Text, FlatList, Alert, StyleSheet } from "react-native";
-import { Button, Card, ActivityIndicator, Snackbar, Dialog, Portal, IconButton, Surface } from "react-native-paper";
+import { Button, Card, ActivityIndicator, Snackbar, Dialog, Portal, IconButton, Surface, Searchbar } from "react-native-paper";
 import { MaterialCommunityIcons } from '@expo/vector-icons';
 import axios from "axios";
 import AsyncStorage from "@react-native-async-storage/async-storage";
@@ -16,6 +16,11 @@ const UserList = () => {
   const [selectedUserId, setSelectedUserId] = useState(null);
   const [dialogVisible, setDialogVisible] = useState(false);
   const [token, setToken] = useState("");
+  const [search, setSearch] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalUsers, setTotalUsers] = useState(0);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const searchTimeout = useRef(null);
 
   useFocusEffect(
     useCallback(() => {
@@ -28,35 +33,53 @@ const UserList = () => {
       const storedToken = await AsyncStorage.getItem("userToken");
       if (storedToken) {
         setToken(storedToken);
-        fetchUsers(storedToken);
+        fetchUsers(storedToken, search);
       }
     } catch (error) {
       console.error("Error fetching token:", error);
     }
   };
 
-  const fetchUsers = async (authToken) => {
-    setLoading(true);
+  // Loads the first page of users matching `query`, or the page after `after`
+  const fetchUsers = async (authToken, query, after = null) => {
+    after ? setLoadingMore(true) : setLoading(true);
     try {
+      const params = { q: query || undefined, after: after || undefined };
       const response = await axios.get(`${config.API_BASE_URL}/api/users/userslist`, {
         headers: { Authorization: `Bearer ${authToken}` },
+        params,
       });
-      setUsers(response.data);
+      const { users: page, next_cursor, total_users } = response.data;
+      setUsers((current) => (after ? [...current, ...page] : page));
+      setNextCursor(next_cursor);
+      setTotalUsers(total_users);
     } catch (error) {
       setSnackbarMessage("Failed to fetch users. Please try again.");
       setSnackbarVisible(true);
     } finally {
-      setLoading(false);
+      after ? setLoadingMore(false) : setLoading(false);
     }
   };
 
+  const loadMoreUsers = () => {
+    if (nextCursor && !loadingMore && !loading) {
+      fetchUsers(token, search, nextCursor);
+    }
+  };
+
+  const handleSearch = (text) => {
+    setSearch(text);
+    clearTimeout(searchTimeout.current);
+    searchTimeout.current = setTimeout(() => fetchUsers(token, text), 300);
+  };
+
   const handleDeleteUser = async () => {
     setDialogVisible(false);
     try {
       await axios.delete(`${config.API_BASE_URL}/api/users/delete/${selectedUserId}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      fetchUsers(token); // Refresh after deleting a user
+      fetchUsers(token, search); // Refresh after deleting a user
       setSnackbarMessage("User deleted successfully!");
     } catch (error) {
       setSnackbarMessage("Failed to delete user. Please try again.");
@@ -135,8 +158,17 @@ const UserList = () => {
       <View style={styles.header}>
         <MaterialCommunityIcons name="account-group" size={24} color="#4CAF50" />
         <Text style={styles.title}>User Management</Text>
+        <Text style={styles.count}>{totalUsers}</Text>
       </View>
 
+      <Searchbar
+        placeholder="Search by name or email"
+        value={search}
+        onChangeText={handleSearch}
+        autoCapitalize="none"
+        style={styles.searchbar}
+      />
+
       {loading ? (
         <ActivityIndicator animating={true} size="large" color="#4CAF50" style={styles.loader} />
       ) : (
@@ -146,6 +178,9 @@ const UserList = () => {
           renderItem={renderUserCard}
           contentContainerStyle={styles.listContainer}
           showsVerticalScrollIndicator={false}
+          onEndReached={loadMoreUsers}
+          onEndReachedThreshold={0.5}
+          ListFooterComponent={loadingMore ? <ActivityIndicator animating={true} color="#4CAF50" style={styles.footerLoader} /> : null}
         />
       )}
 
@@ -198,6 +233,18 @@ const styles = StyleSheet.create({
     marginLeft: 10,
     color: "#333",
   },
+  count: {
+    fontSize: 16,
+    color: "#666",
+    marginLeft: 8,
+  },
+  searchbar: {
+    marginBottom: 12,
+    backgroundColor: 'white',
+  },
+  footerLoader: {
+    marginVertical: 16,
+  },
   listContainer: {
     padding: 4,
   },